@@ -0,0 +1,60 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.decorators import classonlymethod
+
+from foodgram.executor import run_orm, start_request
+
+
+class AsyncReadMixin:
+    async_actions = ('list', 'retrieve')
+
+    @classonlymethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        if not settings.ASYNC_VIEWS or not any(
+            action in cls.async_actions for action in actions.values()
+        ):
+            return view
+        sync_view = sync_to_async(view)
+
+        @wraps(view)
+        async def async_view(request, *args, **kwargs):
+            method = request.method.lower()
+            if method == 'head' and 'head' not in actions:
+                method = 'get'
+            action = actions.get(method)
+            if action not in cls.async_actions:
+                return await sync_view(request, *args, **kwargs)
+            self = cls(**initkwargs)
+            self.action_map = actions
+            self.args = args
+            self.kwargs = kwargs
+            return await self.async_dispatch(request, action, *args, **kwargs)
+
+        return async_view
+
+    async def async_dispatch(self, request, action, *args, **kwargs):
+        start_request()
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.action = action
+        self.headers = self.default_response_headers
+        try:
+            # Аутентификация, права и троттлинг обращаются к БД.
+            await run_orm(self.initial, request, *args, **kwargs)
+            handler = getattr(self, f'async_{action}')
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(
+            request, response, *args, **kwargs
+        )
+        return self.response
+
+    async def async_list(self, request, *args, **kwargs):
+        return await run_orm(self.list, request, *args, **kwargs)
+
+    async def async_retrieve(self, request, *args, **kwargs):
+        return await run_orm(self.retrieve, request, *args, **kwargs)
@@ -0,0 +1,80 @@
+from collections import OrderedDict
+from copy import copy
+from threading import Lock
+from time import monotonic
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from foodgram.dbrouters import use_primary
+from .cache import get_tokens_version
+
+
+class TokenCache:
+    def __init__(self):
+        self._lock = Lock()
+        self._tokens = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._tokens.get(key)
+            if entry is None:
+                return None
+            token, version, expires_at = entry
+            if monotonic() > expires_at:
+                del self._tokens[key]
+                return None
+            self._tokens.move_to_end(key)
+        return token, version
+
+    def set(self, key, token, version):
+        expires_at = monotonic() + settings.TOKEN_CACHE_TIMEOUT
+        with self._lock:
+            self._tokens[key] = (token, version, expires_at)
+            self._tokens.move_to_end(key)
+            while len(self._tokens) > settings.TOKEN_CACHE_SIZE:
+                self._tokens.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._tokens.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._tokens.clear()
+
+
+# Токен из кэша процесса принимается, только пока не изменилась версия
+# токенов пользователя в общем кэше: её меняют выход, удаление токена
+# и правки пользователя, например блокировка или смена пароля.
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        if settings.TOKEN_CACHE_SIZE > 0:
+            entry = token_cache.get(key)
+            if entry is not None:
+                token, version = entry
+                if version == get_tokens_version(token.user_id):
+                    token = copy(token)
+                    token.user = copy(token.user)
+                    return token.user, token
+                token_cache.discard(key)
+        try:
+            user, token = super().authenticate_credentials(key)
+        except AuthenticationFailed:
+            if use_primary.get():
+                raise
+            # Только что выданного токена может ещё не быть на реплике.
+            primary = use_primary.set(True)
+            try:
+                user, token = super().authenticate_credentials(key)
+            finally:
+                use_primary.reset(primary)
+        if settings.TOKEN_CACHE_SIZE > 0:
+            cached = copy(token)
+            cached.user = copy(user)
+            token_cache.set(key, cached, get_tokens_version(user.id))
+        return user, token
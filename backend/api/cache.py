@@ -0,0 +1,191 @@
+from time import time_ns
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import quote_etag
+from django.utils.http import parse_etags, urlencode
+from rest_framework import status
+from rest_framework.response import Response
+
+RECIPES_VERSION_KEY = 'recipes:version'
+COUNTER_ORDER_VERSION_KEY = 'recipes:version:counter_order'
+SHARED_VERSION_KEY = 'recipes:version:shared'
+RECIPE_VERSION_KEY = 'recipes:version:{}'
+RECIPE_FRAGMENT_KEY = 'recipes:fragment:{version}:{derivative}:{pk}'
+TAGS_VERSION_KEY = 'tags:version'
+UNITS_VERSION_KEY = 'componentunits:version'
+COMPONENTS_VERSION_KEY = 'ingredients:version'
+TOKENS_VERSION_KEY = 'tokens:version:{}'
+PROCESS_LOCAL_CACHES = (DummyCache, LocMemCache)
+COUNTER_ORDERINGS = ('popular',)
+
+
+def is_cache_shared():
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], PROCESS_LOCAL_CACHES)
+
+
+def get_fragment_timeout():
+    # Кэш процесса не узнаёт о правках из других процессов и воркера
+    # задач, поэтому фрагменты в нём живут не дольше ответов анонимам.
+    if is_cache_shared():
+        return settings.FRAGMENT_CACHE_TIMEOUT
+    return min(settings.FRAGMENT_CACHE_TIMEOUT,
+               settings.ANONYMOUS_CACHE_TIMEOUT)
+
+
+def get_version(key, timeout=None):
+    version = cache.get(key)
+    if version is None:
+        # Новая версия не должна совпасть с вытесненной из кэша.
+        cache.add(key, time_ns(), timeout=timeout)
+        version = cache.get(key)
+    return version
+
+
+def get_recipe_versions(recipe_ids):
+    keys = {pk: RECIPE_VERSION_KEY.format(pk) for pk in recipe_ids}
+    versions = cache.get_many([SHARED_VERSION_KEY, *keys.values()])
+    shared = versions.get(SHARED_VERSION_KEY)
+    if shared is None:
+        shared = get_version(SHARED_VERSION_KEY)
+    result = {}
+    for pk, key in keys.items():
+        version = versions.get(key)
+        if version is None:
+            version = get_version(key)
+        result[pk] = f'{shared}.{version}'
+    return result
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time_ns(), timeout=None)
+
+
+def get_request_key(request):
+    query = urlencode(sorted(
+        (key, sorted(values))
+        for key, values in request.query_params.lists()
+    ), doseq=True)
+    return f'{request.get_host()}:{request.path}?{query}'
+
+
+def _invalidate(keys):
+    for key in keys:
+        bump_version(key)
+
+
+def invalidate_reference_data(*keys):
+    transaction.on_commit(lambda: _invalidate(keys))
+
+
+def invalidate_counter_order():
+    transaction.on_commit(lambda: _invalidate((COUNTER_ORDER_VERSION_KEY,)))
+
+
+def get_tokens_version(user_id):
+    return get_version(TOKENS_VERSION_KEY.format(user_id))
+
+
+def invalidate_tokens(user_id):
+    key = TOKENS_VERSION_KEY.format(user_id)
+    transaction.on_commit(lambda: _invalidate((key,)))
+
+
+def invalidate_recipes(recipe_ids=None):
+    keys = [RECIPES_VERSION_KEY]
+    if recipe_ids is None:
+        keys.append(SHARED_VERSION_KEY)
+    else:
+        keys.extend(RECIPE_VERSION_KEY.format(pk) for pk in recipe_ids)
+    transaction.on_commit(lambda: _invalidate(keys))
+
+
+class AnonymousCacheMixin:
+    def get_anonymous_cache_key(self, request):
+        pk = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        if pk is None:
+            version = get_version(RECIPES_VERSION_KEY)
+            # Счётчики меняются с каждой отметкой, поэтому от них зависят
+            # только списки с сортировкой по ним.
+            if request.query_params.get('ordering') in COUNTER_ORDERINGS:
+                version = (f'{version}.'
+                           f'{get_version(COUNTER_ORDER_VERSION_KEY)}')
+        else:
+            version = get_recipe_versions((pk,))[pk]
+        return f'anonymous:{version}:{get_request_key(request)}'
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+        key = self.get_anonymous_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, settings.ANONYMOUS_CACHE_TIMEOUT)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+class ConditionalCacheMixin:
+    cache_version_key = None
+
+    def get_conditional_response(self, handler, request, *args, **kwargs):
+        timeout = settings.REFERENCE_CACHE_TIMEOUT
+        version = get_version(self.cache_version_key, timeout)
+        etag = quote_etag(f'{self.cache_version_key}:{version}')
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and (etag in parse_etags(if_none_match)
+                              or if_none_match.strip() == '*'):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            response['ETag'] = etag
+            return response
+
+        renderer = request.accepted_renderer
+        key = (f'{self.cache_version_key}:{version}:'
+               f'{request.accepted_media_type}:{get_request_key(request)}')
+        content = cache.get(key)
+        if content is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            response['ETag'] = etag
+            if renderer.format != 'json':
+                return response
+            content = renderer.render(
+                response.data, request.accepted_media_type,
+                self.get_renderer_context(),
+            )
+            cache.set(key, content, timeout)
+        response = HttpResponse(
+            content, content_type=request.accepted_media_type,
+        )
+        response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
@@ -0,0 +1,87 @@
+import base64
+import binascii
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files import File
+from PIL import ImageFile
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+class Base64ImageField(serializers.ImageField):
+    default_error_messages = {
+        'invalid_data_uri': 'Неверный формат изображения в base64',
+        'too_large': 'Размер изображения больше {max_size} байт',
+        'too_many_pixels': 'Изображение больше {max_pixels} пикселей',
+        'unsupported_format': 'Формат {format} не поддерживается',
+    }
+    allowed_formats = ('JPEG', 'PNG', 'GIF', 'WEBP',)
+    chunk_size = 64 * 1024
+
+    def __init__(self, *args, **kwargs):
+        self.derivative = kwargs.pop('derivative', None)
+        super().__init__(*args, **kwargs)
+
+    def check_header(self, image):
+        if image.format not in self.allowed_formats:
+            self.fail('unsupported_format', format=image.format)
+        width, height = image.size
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            self.fail('too_many_pixels', max_pixels=settings.IMAGE_MAX_PIXELS)
+
+    def decode(self, imgstr):
+        # Клиенты переносят длинный base64 по строкам.
+        imgstr = ''.join(imgstr.split())
+        max_size = settings.IMAGE_MAX_UPLOAD_SIZE
+        if len(imgstr) // 4 * 3 > max_size + 2:
+            self.fail('too_large', max_size=max_size)
+        parser = ImageFile.Parser()
+        header_checked = False
+        file = SpooledTemporaryFile(max_size=1024 * 1024)
+        try:
+            for start in range(0, len(imgstr), self.chunk_size):
+                chunk = base64.b64decode(
+                    imgstr[start:start + self.chunk_size], validate=True,
+                )
+                file.write(chunk)
+                if not header_checked:
+                    parser.feed(chunk)
+                    if parser.image is not None:
+                        self.check_header(parser.image)
+                        header_checked = True
+        except (binascii.Error, OSError, ValueError):
+            file.close()
+            self.fail('invalid_data_uri')
+        except ValidationError:
+            file.close()
+            raise
+        if file.tell() > max_size:
+            file.close()
+            self.fail('too_large', max_size=max_size)
+        file.seek(0)
+        return file
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) and data.startswith('data:image'):
+            try:
+                format, imgstr = data.split(';base64,')
+            except ValueError:
+                self.fail('invalid_data_uri')
+            ext = format.split('/')[-1]
+            data = File(self.decode(imgstr), name='temp.' + ext)
+
+        return super().to_internal_value(data)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        derivative = self.context.get('image_derivative', self.derivative)
+        derivatives = getattr(value.instance, 'image_derivatives', None)
+        if derivative and derivatives and derivatives.get(derivative):
+            url = value.storage.url(derivatives[derivative])
+            request = self.context.get('request')
+            if request is not None:
+                return request.build_absolute_uri(url)
+            return url
+        return super().to_representation(value)
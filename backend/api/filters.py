@@ -3,6 +3,7 @@ from rest_framework.exceptions import ValidationError
 from rest_framework.filters import SearchFilter
 
 from recipes.models import Component, Recipe, Tag
+from recipes.search import search_recipes
 
 
 class ComponentFilter(SearchFilter):
@@ -23,10 +24,20 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = filters.NumberFilter(
         method='filter_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'По популярности'),),
+        method='filter_ordering',
+    )
+
+    ORDERINGS = {
+        'popular': ('-favorites_count', '-in_carts_count', '-pub_date', '-id'),
+    }
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',)
+        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',
+                  'search', 'ordering',)
 
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
@@ -49,3 +60,11 @@ class RecipeFilter(FilterSet):
             elif value == 0:
                 return queryset.exclude(cart__user=user)
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        if not value.strip():
+            return queryset
+        return search_recipes(queryset, value)
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(*self.ORDERINGS[value])
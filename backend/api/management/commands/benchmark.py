@@ -0,0 +1,247 @@
+import json
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.management.base import (BaseCommand, CommandError,
+                                         no_translations)
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from foodgram.urls import router
+from users.models import User
+
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[max(math.ceil(len(values) * percent / 100) - 1, 0)]
+
+
+def get_model(viewset):
+    queryset = getattr(viewset, 'queryset', None)
+    if queryset is not None:
+        return queryset.model
+    return viewset.serializer_class.Meta.model
+
+
+def get_endpoints():
+    for _, viewset, basename in router.registry:
+        sample_pk = None
+        for route in router.get_routes(viewset):
+            if 'get' not in route.mapping:
+                continue
+            name = route.name.format(basename=basename)
+            kwargs = None
+            if route.detail:
+                if sample_pk is None:
+                    sample_pk = get_model(viewset).objects.order_by(
+                        'pk'
+                    ).values_list('pk', flat=True).first()
+                if sample_pk is None:
+                    continue
+                lookup = viewset.lookup_url_kwarg or viewset.lookup_field
+                kwargs = {lookup: sample_pk}
+            yield name, reverse(name, kwargs=kwargs)
+
+
+def summarize(path, status, timings, queries, elapsed):
+    result = {
+        'path': path,
+        'status': status,
+        'requests': len(timings),
+        'rps': round(len(timings) / elapsed, 1),
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'p99_ms': round(percentile(timings, 99), 2),
+        'mean_ms': round(sum(timings) / len(timings), 2),
+    }
+    if queries:
+        result['queries_p50'] = percentile(queries, 50)
+        result['queries_max'] = max(queries)
+    return result
+
+
+def fetch(url, headers):
+    start = perf_counter()
+    try:
+        with urlopen(Request(url, headers=headers)) as response:
+            response.read()
+    except HTTPError as error:
+        response = error
+        error.read()
+    except URLError as error:
+        raise CommandError(f'Сервер недоступен: {error.reason}')
+    duration = (perf_counter() - start) * 1000
+    return response.status, duration, get_query_count(response.headers)
+
+
+def get_query_count(headers):
+    match = SERVER_TIMING_QUERIES.search(headers.get('Server-Timing', ''))
+    return match and int(match.group(1))
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время ответа и число запросов к БД для GET-эндпоинтов '
+            'API и выводит результат в JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Число замеров на эндпоинт (по умолчанию 50)',
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=5,
+            help='Число прогревочных запросов (по умолчанию 5)',
+        )
+        parser.add_argument(
+            '--user', dest='email',
+            help='Email пользователя, от имени которого идут запросы; '
+                 'по умолчанию первый активный пользователь',
+        )
+        parser.add_argument(
+            '--anonymous', action='store_true',
+            help='Выполнять запросы без авторизации',
+        )
+        parser.add_argument(
+            '--endpoint', action='append', dest='endpoints',
+            help='Имя эндпоинта, например recipes-list '
+                 '(можно указать несколько раз)',
+        )
+        parser.add_argument(
+            '--host',
+            help='Заголовок Host; по умолчанию первый из ALLOWED_HOSTS',
+        )
+        parser.add_argument(
+            '--base-url',
+            help='Адрес запущенного сервера, например http://127.0.0.1:8000; '
+                 'по умолчанию запросы выполняются внутри процесса',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=1,
+            help='Число одновременных запросов при --base-url '
+                 '(по умолчанию 1)',
+        )
+        parser.add_argument(
+            '--label', default='',
+            help='Метка прогона, например хэш коммита',
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл для результата, по умолчанию stdout',
+        )
+
+    def get_host(self, options):
+        return options['host'] or next(
+            (host for host in settings.ALLOWED_HOSTS
+             if host and '*' not in host and not host.startswith('.')),
+            'testserver',
+        )
+
+    def get_headers(self, options):
+        headers = {}
+        if options['host'] or not options['base_url']:
+            headers['Host'] = self.get_host(options)
+        if options['anonymous']:
+            return headers, None
+        users = User.objects.filter(is_active=True).order_by('id')
+        if options['email']:
+            users = users.filter(email=options['email'])
+        user = users.first()
+        if user is None:
+            raise CommandError('Пользователь не найден')
+        token, _ = Token.objects.get_or_create(user=user)
+        headers['Authorization'] = f'Token {token.key}'
+        return headers, user.email
+
+    def measure(self, headers, path, requests, warmup):
+        client = Client(**{
+            f'HTTP_{name.upper()}': value for name, value in headers.items()
+        })
+        for _ in range(warmup):
+            client.get(path)
+        timings, queries = [], []
+        started = perf_counter()
+        for _ in range(requests):
+            start = perf_counter()
+            response = client.get(path)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            timings.append((perf_counter() - start) * 1000)
+            queries.append(get_query_count(response))
+        return summarize(path, response.status_code, timings, queries,
+                         perf_counter() - started)
+
+    def measure_live(self, headers, path, requests, warmup, concurrency):
+        url = self.base_url + path
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(
+                lambda _: fetch(url, headers), range(warmup),
+            ))
+            started = perf_counter()
+            results = list(executor.map(
+                lambda _: fetch(url, headers), range(requests),
+            ))
+            elapsed = perf_counter() - started
+        statuses, timings, queries = zip(*results)
+        return summarize(
+            path, max(statuses), list(timings),
+            [cnt for cnt in queries if cnt is not None], elapsed,
+        )
+
+    @no_translations
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['warmup'] < 0:
+            raise CommandError('Неверное число замеров')
+        if options['concurrency'] < 1:
+            raise CommandError('Неверное число одновременных запросов')
+        if options['concurrency'] > 1 and not options['base_url']:
+            raise CommandError('--concurrency работает только с --base-url')
+        headers, email = self.get_headers(options)
+        endpoints = dict(get_endpoints())
+        names = options['endpoints'] or list(endpoints)
+        unknown = set(names) - set(endpoints)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные эндпоинты: {", ".join(sorted(unknown))}'
+            )
+        results = {}
+        for name in names:
+            if options['base_url']:
+                self.base_url = options['base_url'].rstrip('/')
+                results[name] = self.measure_live(
+                    headers, endpoints[name], options['requests'],
+                    options['warmup'], options['concurrency'],
+                )
+            else:
+                # Число запросов к БД берётся из заголовка Server-Timing.
+                with override_settings(SERVER_TIMING=True):
+                    results[name] = self.measure(
+                        headers, endpoints[name],
+                        options['requests'], options['warmup'],
+                    )
+            if options['verbosity'] >= 2:
+                self.stderr.write(
+                    f'{name}: p50 {results[name]["p50_ms"]} мс, '
+                    f'{results[name]["rps"]} запросов в секунду'
+                )
+        report = json.dumps({
+            'label': options['label'],
+            'created': timezone.now().isoformat(),
+            'user': email,
+            'base_url': options['base_url'],
+            'concurrency': options['concurrency'],
+            'results': results,
+        }, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(report)
+        else:
+            self.stdout.write(report)
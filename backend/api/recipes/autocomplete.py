@@ -0,0 +1,62 @@
+from bisect import bisect_left
+from threading import Lock
+from time import monotonic
+
+from recipes.models import Component
+
+# Сигналы сбрасывают индекс только в своём процессе, остальные воркеры
+# перестраивают его по истечении этого срока.
+INDEX_TTL = 300
+
+
+class ComponentIndex:
+    def __init__(self):
+        self._lock = Lock()
+        self._keys = None
+        self._items = None
+        self._built_at = 0
+
+    def _build(self):
+        from .serializers import ComponentSerializer
+
+        components = Component.objects.select_related('unit').order_by(
+            'name', 'id',
+        )
+        items = sorted(
+            (
+                (item['name'].casefold(), item['id'], item)
+                for item in ComponentSerializer(components, many=True).data
+            ),
+            key=lambda entry: entry[:2],
+        )
+        return [key for key, _, _ in items], [item for _, _, item in items]
+
+    def _get(self):
+        keys, items = self._keys, self._items
+        if keys is None or monotonic() - self._built_at > INDEX_TTL:
+            with self._lock:
+                if (self._keys is None
+                        or monotonic() - self._built_at > INDEX_TTL):
+                    self._keys, self._items = self._build()
+                    self._built_at = monotonic()
+                keys, items = self._keys, self._items
+        return keys, items
+
+    def invalidate(self):
+        with self._lock:
+            self._keys = None
+            self._items = None
+
+    def search(self, name):
+        prefix = name.strip().casefold()
+        keys, items = self._get()
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + '\U0010ffff', lo=start)
+        substring = [
+            item for index, item in enumerate(items)
+            if (index < start or index >= end) and prefix in keys[index]
+        ]
+        return items[start:end] + substring
+
+
+component_index = ComponentIndex()
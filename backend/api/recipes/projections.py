@@ -0,0 +1,149 @@
+from collections import defaultdict
+
+from django.core.cache import cache
+
+from recipes.models import Recipe, RecipeComponent
+from api.cache import (RECIPE_FRAGMENT_KEY, get_fragment_timeout,
+                       get_recipe_versions)
+from api.users.utils import get_subscribed_ids
+
+# Ответ собирается из values() в том же виде, что и у RecipeSerializer,
+# без создания моделей и вложенных сериализаторов. Общая для всех часть
+# рецепта кэшируется по версии рецепта, а отметки пользователя берутся
+# из запроса страницы. Счётчики выбираются только для курсора сортировки
+# по популярности.
+ROW_FIELDS = ('id', 'author_id', 'pub_date', 'favorites_count',
+              'in_carts_count',)
+FRAGMENT_FIELDS = ('id', 'author_id', 'name', 'image', 'image_derivatives',
+                   'text', 'cooking_time',)
+AUTHOR_FIELDS = ('username', 'email', 'first_name', 'last_name', 'role',)
+TAG_FIELDS = ('id', 'slug', 'name', 'color',)
+MARK_FIELDS = ('is_favorited', 'is_in_shopping_cart',)
+
+
+def get_recipe_rows(queryset):
+    # Аннотации из сортировки, например ранг поиска, нужны курсору.
+    ordering = [
+        field.lstrip('-') for field in queryset.query.order_by
+        if isinstance(field, str)
+    ]
+    annotations = [
+        name for name in dict.fromkeys((*MARK_FIELDS, *ordering))
+        if name in queryset.query.annotations
+    ]
+    return queryset.prefetch_related(None).select_related(None).values(
+        *ROW_FIELDS, *annotations,
+    )
+
+
+def get_components(recipe_ids):
+    components = defaultdict(list)
+    rows = RecipeComponent.objects.filter(
+        recipe_id__in=recipe_ids,
+    ).order_by('id').values_list(
+        'recipe_id', 'component_id', 'component__name',
+        'component__unit_id', 'component__unit__name', 'amount',
+    )
+    for recipe_id, component_id, name, unit_id, unit, amount in rows:
+        components[recipe_id].append({
+            'id': component_id,
+            'name': name,
+            'unit': str(unit_id),
+            'measurement_unit': unit,
+            'amount': amount,
+        })
+    return components
+
+
+def get_tags(recipe_ids):
+    tags = defaultdict(list)
+    rows = Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids,
+    ).order_by('tag__name', 'tag__color').values_list(
+        'recipe_id', *(f'tag__{field}' for field in TAG_FIELDS),
+    )
+    for recipe_id, *values in rows:
+        tags[recipe_id].append(dict(zip(TAG_FIELDS, values)))
+    return tags
+
+
+def get_image_url(row, derivative):
+    name = row['image']
+    if not name:
+        return None
+    derivatives = row['image_derivatives']
+    if derivative and derivatives and derivatives.get(derivative):
+        name = derivatives[derivative]
+    return Recipe._meta.get_field('image').storage.url(name)
+
+
+def build_fragments(recipe_ids, derivative):
+    rows = Recipe.objects.filter(id__in=recipe_ids).values(
+        *FRAGMENT_FIELDS, *(f'author__{field}' for field in AUTHOR_FIELDS),
+    )
+    components = get_components(recipe_ids)
+    tags = get_tags(recipe_ids)
+    return {row['id']: {
+        'id': row['id'],
+        'author': {
+            'id': row['author_id'],
+            'username': row['author__username'],
+            'email': row['author__email'],
+            'first_name': row['author__first_name'],
+            'last_name': row['author__last_name'],
+            'role': row['author__role'],
+            'is_subscribed': False,
+        },
+        'name': row['name'],
+        'image': get_image_url(row, derivative),
+        'text': row['text'],
+        'ingredients': components[row['id']],
+        'tags': tags[row['id']],
+        'cooking_time': row['cooking_time'],
+        'is_favorited': False,
+        'is_in_shopping_cart': False,
+    } for row in rows}
+
+
+def get_fragments(recipe_ids, derivative):
+    keys = {
+        pk: RECIPE_FRAGMENT_KEY.format(
+            version=version, derivative=derivative, pk=pk,
+        )
+        for pk, version in get_recipe_versions(recipe_ids).items()
+    }
+    cached = cache.get_many(keys.values())
+    fragments = {pk: cached[key] for pk, key in keys.items() if key in cached}
+    missing = [pk for pk in recipe_ids if pk not in fragments]
+    if missing:
+        built = build_fragments(missing, derivative)
+        cache.set_many(
+            {keys[pk]: fragment for pk, fragment in built.items()},
+            get_fragment_timeout(),
+        )
+        fragments.update(built)
+    return fragments
+
+
+def project_recipes(rows, request, derivative=None):
+    if not rows:
+        return []
+    fragments = get_fragments([row['id'] for row in rows], derivative)
+    subscribed_ids = get_subscribed_ids(request)
+    recipes = []
+    for row in rows:
+        fragment = fragments.get(row['id'])
+        if fragment is None:
+            # Рецепт удалён после запроса страницы.
+            continue
+        recipe = dict(fragment)
+        recipe['author'] = dict(
+            fragment['author'],
+            is_subscribed=row['author_id'] in subscribed_ids,
+        )
+        if recipe['image'] is not None:
+            recipe['image'] = request.build_absolute_uri(recipe['image'])
+        for field in MARK_FIELDS:
+            recipe[field] = row[field]
+        recipes.append(recipe)
+    return recipes
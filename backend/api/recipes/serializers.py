@@ -1,14 +1,15 @@
-import base64
-
 from django.contrib.auth import get_user_model
-from django.core.files.base import ContentFile
 from django.core.validators import MinValueValidator
 from django.db import transaction
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
-from recipes.models import (Component, ComponentUnit, Favorite, Recipe,
-                            RecipeComponent, ShoppingCart, Tag)
+from recipes.models import (Component, ComponentUnit, Recipe,
+                            RecipeComponent, Tag)
+from recipes.jobs import fan_out, make_image_derivatives
+from recipes.search import update_search_index
+from recipes.utils import update_shopping_lists, updating_recipe_components
+from api.fields import Base64ImageField
 from api.users.serializers import UserSerializer
 
 
@@ -43,17 +44,6 @@ class ComponentPostSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class Base64ImageField(serializers.ImageField):
-    def to_internal_value(self, data):
-        if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
-
-        return super().to_internal_value(data)
-
-
 class IngredientSerializer(serializers.ModelSerializer):
     id = serializers.PrimaryKeyRelatedField(
         queryset=Component.objects.all(),
@@ -127,8 +117,11 @@ class RecipePostSerializer(serializers.ModelSerializer):
                 )
             )
         RecipeComponent.objects.bulk_create(recipe_component)
+        update_search_index((recipe.id,))
 
     def validate(self, data):
+        if self.partial and 'recipe_component' not in data:
+            return data
         value = data.get('recipe_component')
         if not value:
             raise ValidationError({
@@ -159,9 +152,46 @@ class RecipePostSerializer(serializers.ModelSerializer):
             )
             recipe.tags.set(tags)
             self._set_components(recipe, components)
+            make_image_derivatives.enqueue(recipe.id, recipe.image.name)
+            fan_out.enqueue(recipe.id)
 
         return recipe
 
+    @staticmethod
+    def _update_components(recipe, components):
+        new_components = {
+            component['component']['id'].id: component['amount']
+            for component in components
+        }
+        current = {
+            recipe_component.component_id: recipe_component
+            for recipe_component in RecipeComponent.objects.filter(
+                recipe=recipe
+            )
+        }
+        old_components = {
+            component_id: recipe_component.amount
+            for component_id, recipe_component in current.items()
+        }
+        changed = []
+        for component_id, recipe_component in current.items():
+            amount = new_components.get(component_id)
+            if amount is not None and amount != recipe_component.amount:
+                recipe_component.amount = amount
+                changed.append(recipe_component)
+        with updating_recipe_components():
+            RecipeComponent.objects.filter(
+                recipe=recipe,
+            ).exclude(component_id__in=new_components).delete()
+            RecipeComponent.objects.bulk_update(changed, ('amount',))
+            RecipeComponent.objects.bulk_create(
+                RecipeComponent(recipe=recipe, component_id=component_id,
+                                amount=amount)
+                for component_id, amount in new_components.items()
+                if component_id not in current
+            )
+            update_shopping_lists(recipe, old_components, new_components)
+
     def update(self, instance, validated_data):
         instance.name = validated_data.get('name', instance.name)
         instance.text = validated_data.get('text', instance.text)
@@ -171,70 +201,36 @@ class RecipePostSerializer(serializers.ModelSerializer):
             instance.cooking_time
         )
 
-        tags = validated_data.pop('tags')
-        components = validated_data.pop('recipe_component')
-
         with transaction.atomic():
-            instance.tags.clear()
-            instance.tags.set(tags)
-            instance.ingredients.clear()
-            self._set_components(instance, components)
+            if 'tags' in validated_data:
+                instance.tags.set(validated_data['tags'])
+            if 'recipe_component' in validated_data:
+                self._update_components(
+                    instance, validated_data['recipe_component'],
+                )
+            # Сохранение рецепта один раз обновляет поисковый индекс
+            # и версию рецепта в кэше, уже с новыми ингредиентами.
             instance.save()
+            if 'image' in validated_data:
+                make_image_derivatives.enqueue(
+                    instance.id, instance.image.name,
+                )
 
         return instance
 
 
 class RecipeInfoSerializer(serializers.ModelSerializer):
-    image = Base64ImageField(required=False, allow_null=True)
+    image = Base64ImageField(
+        required=False, allow_null=True, derivative='thumbnail',
+    )
 
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time',)
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
-    user = serializers.PrimaryKeyRelatedField(
-        queryset=User.objects.all(),
-        write_only=True,
-        error_messages={'does_not_exist': 'Такого пользователя не существует'},
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False, max_length=100,
     )
-    recipe = serializers.PrimaryKeyRelatedField(
-        queryset=Recipe.objects.all(),
-        write_only=True,
-        error_messages={'does_not_exist': 'Такого рецепта не существует'},
-    )
-
-    class Meta:
-        model = Favorite
-        fields = ('user', 'recipe',)
-
-    def validate(self, data):
-        user = data.get('user')
-        recipe = data.get('recipe')
-        if user.favorites.filter(recipe=recipe).exists():
-            raise ValidationError({'error': 'Рецепт уже в избранном'})
-        return data
-
-
-class ShoppingCartSerializer(serializers.ModelSerializer):
-    user = serializers.PrimaryKeyRelatedField(
-        queryset=User.objects.all(),
-        write_only=True,
-        error_messages={'does_not_exist': 'Такого пользователя не существует'},
-    )
-    recipe = serializers.PrimaryKeyRelatedField(
-        queryset=Recipe.objects.all(),
-        write_only=True,
-        error_messages={'does_not_exist': 'Такого рецепта не существует'},
-    )
-
-    class Meta:
-        model = ShoppingCart
-        fields = ('user', 'recipe',)
-
-    def validate(self, data):
-        user = data.get('user')
-        recipe = data.get('recipe')
-        if user.cart.filter(recipe=recipe).exists():
-            raise ValidationError({'error': 'Рецепт уже в корзине'})
-        return data
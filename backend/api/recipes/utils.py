@@ -1,37 +1,70 @@
-from django.db.models import Sum
-from django.shortcuts import get_object_or_404
+import csv
+import json
 
-from recipes.models import Recipe, RecipeComponent
+from recipes.models import ShoppingListItem
+
+
+class Echo:
+    def write(self, value):
+        return value
 
 
 def get_shopping_cart(user):
-    components = RecipeComponent.objects.filter(
-        recipe__cart__user=user
+    return ShoppingListItem.objects.filter(
+        user=user
     ).order_by(
         'component__name',
     ).values(
         'component__name',
         'component__unit__name',
-    ).annotate(amount=Sum('amount'))
-    data = []
+        'amount',
+    )
+
+
+def stream_shopping_cart_txt(components):
+    separator = ''
     for component in components:
-        data.append(
-            f'{component["component__name"]} '
+        yield (
+            f'{separator}{component["component__name"]} '
             f'({component["component__unit__name"]}) - '
             f'{component["amount"]}'
         )
-    content = '\n'.join(data)
-    return content
-
-
-def make(request, pk, serializer_class):
-    user = request.user
-    recipe = get_object_or_404(Recipe, pk=pk)
-    data = {
-        'user': user.id,
-        'recipe': recipe.id,
-    }
-    serializer = serializer_class(data=data)
-    serializer.is_valid(raise_exception=True)
-    serializer.save()
-    return recipe
+        separator = '\n'
+
+
+def stream_shopping_cart_csv(components):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount',))
+    for component in components:
+        yield writer.writerow((
+            component['component__name'],
+            component['component__unit__name'],
+            component['amount'],
+        ))
+
+
+def stream_shopping_cart_json(components):
+    separator = ''
+    yield '['
+    for component in components:
+        item = json.dumps({
+            'name': component['component__name'],
+            'measurement_unit': component['component__unit__name'],
+            'amount': component['amount'],
+        }, ensure_ascii=False)
+        yield f'{separator}{item}'
+        separator = ','
+    yield ']'
+
+
+SHOPPING_CART_FORMATS = {
+    'txt': ('text/plain; charset=utf-8', stream_shopping_cart_txt,),
+    'csv': ('text/csv; charset=utf-8', stream_shopping_cart_csv,),
+    'json': ('application/json', stream_shopping_cart_json,),
+}
+
+
+def stream_shopping_cart(user, file_type):
+    content_type, stream = SHOPPING_CART_FORMATS[file_type]
+    components = get_shopping_cart(user).iterator()
+    return content_type, stream(components)
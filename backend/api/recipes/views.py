@@ -1,35 +1,52 @@
-from django.db.models import Exists, OuterRef, Value
-from django.http.response import FileResponse
-from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch, Value
+from django.http import Http404
+from django.http.response import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import permissions
 from rest_framework import status
 from rest_framework import viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 
-from foodgram.pagination import CustomPagination
+from foodgram.executor import gather_orm, run_orm
+from foodgram.pagination import FeedPagination, KeysetPagination
 from foodgram.permissions import IsAdminOrReadOnly
 from recipes.models import (Component, ComponentUnit, Favorite, Recipe,
-                            ShoppingCart, Tag,)
+                            RecipeComponent, ShoppingCart, Tag,)
+from recipes.marks import add_marks, get_marked_ids, remove_marks
+from recipes.utils import (remove_recipe_from_shopping_lists,
+                           updating_shopping_lists)
 
+from api.async_views import AsyncReadMixin
+from api.cache import (COMPONENTS_VERSION_KEY, TAGS_VERSION_KEY,
+                       UNITS_VERSION_KEY, AnonymousCacheMixin,
+                       ConditionalCacheMixin)
 from api.filters import ComponentFilter, RecipeFilter
+from api.users.utils import get_subscribed_ids
 from .serializers import (ComponentSerializer, ComponentPostSerializer,
-                          ComponentUnitSerializer, FavoriteSerializer,
+                          ComponentUnitSerializer, RecipeIdsSerializer,
                           RecipeInfoSerializer, RecipePostSerializer,
-                          RecipeSerializer, ShoppingCartSerializer,
-                          TagSerializer,)
-from .utils import get_shopping_cart, make
+                          RecipeSerializer, TagSerializer,)
+from .autocomplete import component_index
+from .projections import get_recipe_rows, project_recipes
+from .utils import SHOPPING_CART_FORMATS, stream_shopping_cart
 
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(AsyncReadMixin, ConditionalCacheMixin,
+                 viewsets.ModelViewSet):
     queryset = Tag.objects.all()
+    cache_version_key = TAGS_VERSION_KEY
     serializer_class = TagSerializer
     permission_classes = (IsAdminOrReadOnly,)
 
 
-class ComponentViewSet(viewsets.ModelViewSet):
+class ComponentViewSet(AsyncReadMixin, ConditionalCacheMixin,
+                       viewsets.ModelViewSet):
     queryset = Component.objects.select_related('unit').all()
+    cache_version_key = COMPONENTS_VERSION_KEY
     serializer_class = ComponentSerializer
     permission_classes = (IsAdminOrReadOnly,)
     filter_backends = (ComponentFilter,)
@@ -40,26 +57,60 @@ class ComponentViewSet(viewsets.ModelViewSet):
             return ComponentSerializer
         return ComponentPostSerializer
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get(ComponentFilter.search_param)
+        if name and name.strip():
+            return Response(component_index.search(name))
+        return super().list(request, *args, **kwargs)
 
-class ComponentUnitViewSet(viewsets.ModelViewSet):
+
+class ComponentUnitViewSet(AsyncReadMixin, ConditionalCacheMixin,
+                           viewsets.ModelViewSet):
     queryset = ComponentUnit.objects.all()
+    cache_version_key = UNITS_VERSION_KEY
     serializer_class = ComponentUnitSerializer
     permission_classes = (IsAdminOrReadOnly,)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(AsyncReadMixin, AnonymousCacheMixin,
+                    viewsets.ModelViewSet):
     serializer_class = RecipeSerializer
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
-    pagination_class = CustomPagination
+    pagination_class = KeysetPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    annotate_marks = True
 
     def get_serializer_class(self):
-        if self.action in ('list', 'retrieve'):
+        if self.action in ('list', 'retrieve', 'feed'):
             return RecipeSerializer
         return RecipePostSerializer
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in ('list', 'feed'):
+            context['image_derivative'] = 'card'
+        elif self.action == 'retrieve':
+            context['image_derivative'] = 'full'
+        return context
+
     def get_queryset(self):
+        queryset = (
+            Recipe.objects
+            .prefetch_related(
+                'tags',
+                Prefetch(
+                    'recipe_component',
+                    queryset=RecipeComponent.objects.select_related(
+                        'component__unit'
+                    ).order_by('id'),
+                ),
+            )
+            .select_related('author')
+            .order_by('-pub_date', '-id')
+        )
+        if not self.annotate_marks:
+            return queryset
         if self.request.user.is_authenticated:
             user = self.request.user
             favorites = Exists(Favorite.objects.filter(
@@ -71,57 +122,186 @@ class RecipeViewSet(viewsets.ModelViewSet):
         else:
             favorites = Value(False)
             cart = Value(False)
-        queryset = (
-            Recipe.objects
-            .prefetch_related('tags', 'ingredients',)
-            .select_related('author')
+        return (
+            queryset
             .annotate(is_favorited=favorites)
             .annotate(is_in_shopping_cart=cart)
-            .order_by('-pub_date')
         )
-        return queryset
+
+    def set_marks(self, rows, favorite_ids, cart_ids):
+        for row in rows:
+            row['is_favorited'] = row['id'] in favorite_ids
+            row['is_in_shopping_cart'] = row['id'] in cart_ids
+
+    def get_row(self):
+        queryset = get_recipe_rows(self.filter_queryset(self.get_queryset()))
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(
+            queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        self.check_object_permissions(self.request, row)
+        return row
+
+    def project(self, rows):
+        return project_recipes(
+            rows, self.request,
+            self.get_serializer_context().get('image_derivative'),
+        )
+
+    def list_rows(self, request, *args, **kwargs):
+        rows = self.paginate_queryset(
+            get_recipe_rows(self.filter_queryset(self.get_queryset()))
+        )
+        return self.get_paginated_response(self.project(rows))
+
+    def retrieve_row(self, request, *args, **kwargs):
+        return Response(self.project([self.get_row()])[0])
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            self.list_rows, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            self.retrieve_row, request, *args, **kwargs
+        )
+
+    async def async_list(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return await super().async_list(request, *args, **kwargs)
+        # Отметки пользователя читаются отдельными запросами параллельно
+        # со страницей рецептов, а не подзапросами в ней.
+        self.annotate_marks = False
+        queryset = await run_orm(self.filter_queryset, self.get_queryset())
+        rows, favorite_ids, cart_ids, _ = await gather_orm(
+            (self.paginate_queryset, get_recipe_rows(queryset)),
+            (get_marked_ids, request.user, Favorite),
+            (get_marked_ids, request.user, ShoppingCart),
+            (get_subscribed_ids, request),
+        )
+        self.set_marks(rows, favorite_ids, cart_ids)
+        data = await run_orm(self.project, rows)
+        return self.get_paginated_response(data)
+
+    async def async_retrieve(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return await super().async_retrieve(request, *args, **kwargs)
+        self.annotate_marks = False
+        recipe_ids = (self.kwargs[self.lookup_url_kwarg or self.lookup_field],)
+        row, favorite_ids, cart_ids, _ = await gather_orm(
+            (self.get_row,),
+            (get_marked_ids, request.user, Favorite, recipe_ids),
+            (get_marked_ids, request.user, ShoppingCart, recipe_ids),
+            (get_subscribed_ids, request),
+        )
+        self.set_marks((row,), favorite_ids, cart_ids)
+        return Response((await run_orm(self.project, (row,)))[0])
+
+    def perform_destroy(self, instance):
+        with transaction.atomic(), updating_shopping_lists():
+            remove_recipe_from_shopping_lists(instance)
+            instance.delete()
+
+    def add_mark(self, request, pk, model, error):
+        recipe = get_object_or_404(Recipe, pk=pk)
+        if not add_marks(request.user, model, (recipe.id,)):
+            raise ValidationError({'error': error})
+        serializer = RecipeInfoSerializer(recipe, context={"request": request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def delete_mark(self, request, pk, model, message):
+        if not remove_marks(request.user, model, (pk,)):
+            raise Http404
+        return Response({'detail': message}, status=status.HTTP_204_NO_CONTENT)
+
+    def add_marks_bulk(self, request, model):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        recipes = list(Recipe.objects.filter(id__in=recipe_ids))
+        missing = set(recipe_ids) - {recipe.id for recipe in recipes}
+        if missing:
+            raise ValidationError({
+                'recipes': 'Таких рецептов не существует: '
+                           f'{", ".join(map(str, sorted(missing)))}'
+            })
+        add_marks(request.user, model, (recipe.id for recipe in recipes))
+        serializer = RecipeInfoSerializer(
+            recipes, many=True, context={"request": request},
+        )
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def delete_marks_bulk(self, request, model, message):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        remove_marks(
+            request.user, model, serializer.validated_data['recipes'],
+        )
+        return Response({'detail': message}, status=status.HTTP_204_NO_CONTENT)
 
     @action(
         ('post',), permission_classes=(permissions.IsAuthenticated,),
         detail=True,
     )
     def favorite(self, request, pk=None):
-        recipe = make(request, pk, FavoriteSerializer)
-        serializer = RecipeInfoSerializer(recipe, context={"request": request})
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return self.add_mark(request, pk, Favorite, 'Рецепт уже в избранном')
 
     @favorite.mapping.delete
     def delete_favorite(self, request, pk=None):
-        user = request.user
-        recipe = get_object_or_404(Recipe, pk=pk)
-        get_object_or_404(
-            Favorite, user=user, recipe=recipe,
-        ).delete()
-        message = {
-            'detail': 'Рецепт удалён из избранного'
-        }
-        return Response(message, status=status.HTTP_204_NO_CONTENT)
+        return self.delete_mark(
+            request, pk, Favorite, 'Рецепт удалён из избранного',
+        )
+
+    @action(
+        ('post',), permission_classes=(permissions.IsAuthenticated,),
+        detail=False, url_path='favorite',
+    )
+    def favorite_bulk(self, request):
+        return self.add_marks_bulk(request, Favorite)
+
+    @favorite_bulk.mapping.delete
+    def delete_favorite_bulk(self, request):
+        return self.delete_marks_bulk(
+            request, Favorite, 'Рецепты удалены из избранного',
+        )
 
     @action(
         ('post',), permission_classes=(permissions.IsAuthenticated,),
         detail=True,
     )
     def shopping_cart(self, request, pk=None):
-        recipe = make(request, pk, ShoppingCartSerializer)
-        serializer = RecipeInfoSerializer(recipe, context={"request": request})
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return self.add_mark(request, pk, ShoppingCart, 'Рецепт уже в корзине')
 
     @shopping_cart.mapping.delete
     def delete_shopping_cart(self, request, pk=None):
-        user = request.user
-        recipe = get_object_or_404(Recipe, pk=pk)
-        get_object_or_404(
-            ShoppingCart, user=user, recipe=recipe,
-        ).delete()
-        message = {
-            'detail': 'Рецепт удалён из корзины'
-        }
-        return Response(message, status=status.HTTP_204_NO_CONTENT)
+        return self.delete_mark(
+            request, pk, ShoppingCart, 'Рецепт удалён из корзины',
+        )
+
+    @action(
+        ('post',), permission_classes=(permissions.IsAuthenticated,),
+        detail=False, url_path='shopping_cart',
+    )
+    def shopping_cart_bulk(self, request):
+        return self.add_marks_bulk(request, ShoppingCart)
+
+    @shopping_cart_bulk.mapping.delete
+    def delete_shopping_cart_bulk(self, request):
+        return self.delete_marks_bulk(
+            request, ShoppingCart, 'Рецепты удалены из корзины',
+        )
+
+    @action(
+        ('get',), permission_classes=(permissions.IsAuthenticated,),
+        detail=False, pagination_class=FeedPagination,
+    )
+    def feed(self, request):
+        page = self.paginate_queryset(
+            self.filter_queryset(self.get_queryset())
+        )
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     @action(
         ('get',), permission_classes=(permissions.IsAuthenticated,),
@@ -129,8 +309,14 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def download_shopping_cart(self, request):
         user = request.user
-        content = get_shopping_cart(user)
-        file = 'shopping_cart.txt'
-        response = FileResponse(content, content_type='text/plain')
+        file_type = request.query_params.get('type', 'txt')
+        if file_type not in SHOPPING_CART_FORMATS:
+            raise ValidationError({
+                'type': 'Допустимые форматы: '
+                        f'{", ".join(SHOPPING_CART_FORMATS)}'
+            })
+        content_type, content = stream_shopping_cart(user, file_type)
+        file = f'shopping_cart.{file_type}'
+        response = StreamingHttpResponse(content, content_type=content_type)
         response['Content-Disposition'] = f'attachment; filename={file}'
         return response
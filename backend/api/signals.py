@@ -0,0 +1,124 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.counters import counters_changed
+from recipes.models import (Component, ComponentUnit, Recipe,
+                            RecipeComponent, Tag)
+from recipes.utils import is_updating_recipe_components
+from .cache import (COMPONENTS_VERSION_KEY, TAGS_VERSION_KEY,
+                    UNITS_VERSION_KEY, invalidate_counter_order,
+                    invalidate_recipes, invalidate_reference_data,
+                    invalidate_tokens)
+from .recipes.autocomplete import component_index
+
+User = get_user_model()
+
+# Поля автора, которые попадают в ответы с рецептами.
+AUTHOR_FIELDS = frozenset(('username', 'first_name', 'last_name', 'email'))
+
+
+@receiver(post_save, sender=Component)
+@receiver(post_delete, sender=Component)
+@receiver(post_save, sender=ComponentUnit)
+@receiver(post_delete, sender=ComponentUnit)
+def invalidate_component_index(sender, **kwargs):
+    component_index.invalidate()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    invalidate_reference_data(TAGS_VERSION_KEY)
+
+
+@receiver(post_save, sender=Component)
+@receiver(post_delete, sender=Component)
+def invalidate_components(sender, **kwargs):
+    invalidate_reference_data(COMPONENTS_VERSION_KEY)
+
+
+@receiver(post_save, sender=ComponentUnit)
+@receiver(post_delete, sender=ComponentUnit)
+def invalidate_units(sender, **kwargs):
+    invalidate_reference_data(UNITS_VERSION_KEY, COMPONENTS_VERSION_KEY)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe(sender, instance, **kwargs):
+    invalidate_recipes((instance.id,))
+
+
+@receiver(post_save, sender=RecipeComponent)
+@receiver(post_delete, sender=RecipeComponent)
+def invalidate_recipe_component(sender, instance, **kwargs):
+    if not is_updating_recipe_components():
+        invalidate_recipes((instance.recipe_id,))
+
+
+@receiver(counters_changed)
+def invalidate_recipe_order(sender, **kwargs):
+    # Счётчиков нет в ответах, от них зависит только порядок списков.
+    invalidate_counter_order()
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(sender, instance, action, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if isinstance(instance, Recipe):
+        invalidate_recipes((instance.id,))
+    else:
+        invalidate_recipes()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Component)
+@receiver(post_delete, sender=Component)
+@receiver(post_save, sender=ComponentUnit)
+@receiver(post_delete, sender=ComponentUnit)
+def invalidate_all_recipes(sender, **kwargs):
+    invalidate_recipes()
+
+
+@receiver(pre_save, sender=User)
+def remember_author_fields(sender, instance, raw, update_fields=None,
+                           **kwargs):
+    instance._old_author_fields = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and AUTHOR_FIELDS.isdisjoint(update_fields):
+        return
+    instance._old_author_fields = sender.objects.filter(
+        pk=instance.pk,
+    ).values(*AUTHOR_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_author(sender, instance, **kwargs):
+    old = getattr(instance, '_old_author_fields', None)
+    if old is None or all(
+        old[field] == getattr(instance, field) for field in AUTHOR_FIELDS
+    ):
+        return
+    recipe_ids = list(Recipe.objects.filter(
+        author=instance,
+    ).values_list('id', flat=True))
+    if recipe_ids:
+        invalidate_recipes(recipe_ids)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_tokens(instance.id)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    invalidate_tokens(instance.user_id)
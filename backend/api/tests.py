@@ -0,0 +1,526 @@
+import base64
+import json
+import os
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser, update_last_login
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from recipes.images import update_recipe_derivatives
+from recipes.feed import add_author_to_feed
+from recipes.marks import add_marks
+from recipes.models import (Component, ComponentUnit, Favorite, FeedItem,
+                            Recipe, RecipeComponent, ShoppingCart,
+                            ShoppingListItem, Tag)
+from recipes.search import update_search_index
+from recipes.tests import create_recipe, create_user
+from users.models import Subscription, User
+from .authentication import CachedTokenAuthentication, TokenCache
+from .cache import get_fragment_timeout, get_recipe_versions
+from .fields import Base64ImageField
+from .recipes.projections import (get_fragments, get_recipe_rows,
+                                  project_recipes)
+from .recipes.serializers import RecipeSerializer
+from .recipes.views import RecipeViewSet
+from .renderers import FastJSONRenderer
+
+
+class FragmentCacheTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.recipe = create_recipe(create_user('author'))
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(FRAGMENT_CACHE_TIMEOUT=3600, ANONYMOUS_CACHE_TIMEOUT=60)
+    def test_process_local_cache_timeout_is_capped(self):
+        self.assertEqual(get_fragment_timeout(), 60)
+        with mock.patch.object(cache, 'set_many') as set_many:
+            get_fragments([self.recipe.id], 'card')
+        self.assertEqual(set_many.call_args[0][1], 60)
+
+    @override_settings(FRAGMENT_CACHE_TIMEOUT=3600, ANONYMOUS_CACHE_TIMEOUT=60)
+    def test_shared_cache_timeout(self):
+        with tempfile.TemporaryDirectory() as location:
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.'
+                           'FileBasedCache',
+                'LOCATION': location,
+            }}):
+                self.assertEqual(get_fragment_timeout(), 3600)
+
+    def test_derivatives_update_invalidates_fragments(self):
+        pk = self.recipe.id
+        version = get_recipe_versions((pk,))[pk]
+        fragment = get_fragments([pk], 'card')[pk]
+        Recipe.objects.filter(id=pk).update(name='Щи')
+        with self.captureOnCommitCallbacks(execute=True):
+            update_recipe_derivatives(Recipe.objects.get(id=pk))
+        self.assertNotEqual(get_recipe_versions((pk,))[pk], version)
+        self.assertEqual(fragment['name'], 'Борщ')
+        self.assertEqual(get_fragments([pk], 'card')[pk]['name'], 'Щи')
+
+    def get_author_name(self):
+        response = APIClient().get(f'/api/recipes/{self.recipe.id}/')
+        self.assertEqual(response.status_code, 200)
+        return response.data['author']['first_name']
+
+    def test_user_changes_keep_recipes_cached(self):
+        self.get_author_name()
+        author = User.objects.get(id=self.recipe.author_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            create_user('reader')
+            author.set_password('new password')
+            author.save()
+            update_last_login(None, author)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_author_name(), 'author')
+
+    def test_author_rename_invalidates_recipes(self):
+        other = create_recipe(create_user('other'), name='Щи')
+        versions = get_recipe_versions((self.recipe.id, other.id))
+        self.get_author_name()
+        author = User.objects.get(id=self.recipe.author_id)
+        author.first_name = 'Автор'
+        with self.captureOnCommitCallbacks(execute=True):
+            author.save()
+        self.assertEqual(self.get_author_name(), 'Автор')
+        self.assertEqual(
+            get_recipe_versions((other.id,))[other.id], versions[other.id],
+        )
+
+
+class FeedTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.author = create_user('author')
+        cls.celebrity = create_user('celebrity')
+        cls.fan = create_user('fan')
+        cls.recipes = []
+        for number in range(4):
+            for author in (cls.author, cls.celebrity):
+                cls.recipes.append(
+                    create_recipe(author, name=f'{author} {number}')
+                )
+        for user, author in ((cls.user, cls.author),
+                             (cls.user, cls.celebrity),
+                             (cls.fan, cls.celebrity)):
+            Subscription.objects.create(user=user, author=author)
+        with override_settings(FEED_FANOUT_LIMIT=1):
+            add_author_to_feed(cls.user.id, cls.author.id)
+            add_author_to_feed(cls.user.id, cls.celebrity.id)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_follower_count_is_stored(self):
+        self.celebrity.refresh_from_db()
+        self.assertEqual(self.celebrity.followers_count, 2)
+        Subscription.objects.filter(user=self.fan).delete()
+        self.celebrity.refresh_from_db()
+        self.assertEqual(self.celebrity.followers_count, 1)
+        self.celebrity.first_name = 'Звезда'
+        self.celebrity.save()
+        self.celebrity.refresh_from_db()
+        self.assertEqual(self.celebrity.followers_count, 1)
+
+    def test_feed_item_copies_pub_date(self):
+        item = FeedItem.objects.get(user=self.user, recipe=self.recipes[0])
+        self.assertEqual(item.pub_date, self.recipes[0].pub_date)
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_feed_merges_fan_out_on_read_authors(self):
+        self.assertFalse(FeedItem.objects.filter(
+            recipe__author=self.celebrity,
+        ).exists())
+        url, ids = '/api/recipes/feed/?limit=3&count=1', []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['count'], 8)
+            ids += [recipe['id'] for recipe in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(
+            ids, [recipe.id for recipe in reversed(self.recipes)],
+        )
+        response = self.client.get(
+            '/api/recipes/feed/', {'author': self.author.id},
+        )
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [recipe.id for recipe in reversed(self.recipes)
+             if recipe.author == self.author],
+        )
+
+
+class ProjectionTest(TestCase):
+    # Ответы, собранные из values(), должны побайтно совпадать
+    # с ответами RecipeSerializer.
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.reader = create_user('reader')
+        breakfast = Tag.objects.create(name='завтрак', color='#E26C2D')
+        dinner = Tag.objects.create(name='ужин', color='#49B64E')
+        recipes = [
+            create_recipe(cls.author, name=name, amount=amount)
+            for name, amount in (('Борщ', 100), ('Щи', 30), ('Каша', 5))
+        ]
+        recipes[0].tags.set((dinner, breakfast))
+        recipes[1].tags.set((breakfast,))
+        Recipe.objects.filter(id=recipes[0].id).update(
+            image='recipes/images/borsch.png',
+            image_derivatives={
+                size: f'recipes/images/borsch_{size}.jpg'
+                for size in ('thumbnail', 'card', 'full')
+            },
+        )
+        # Уменьшенные копии ещё не готовы.
+        Recipe.objects.filter(id=recipes[1].id).update(
+            image='recipes/images/shchi.png',
+        )
+        Subscription.objects.create(user=cls.reader, author=cls.author)
+        add_marks(cls.reader, Favorite, (recipes[0].id,))
+        add_marks(cls.reader, ShoppingCart, (recipes[0].id, recipes[2].id))
+
+    def setUp(self):
+        cache.clear()
+
+    def get_request(self, user):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = user
+        return request
+
+    def assert_same_content(self, user, derivative):
+        request = self.get_request(user)
+        view = RecipeViewSet(request=request, format_kwarg=None, kwargs={})
+        queryset = view.get_queryset()
+        expected = JSONRenderer().render(RecipeSerializer(
+            queryset, many=True,
+            context={'request': request, 'image_derivative': derivative},
+        ).data)
+        # Второй проход собирает рецепты из кэша.
+        for _ in range(2):
+            content = FastJSONRenderer().render(project_recipes(
+                list(get_recipe_rows(queryset)), request, derivative,
+            ))
+            self.assertEqual(content, expected)
+        return json.loads(expected)
+
+    def test_anonymous(self):
+        for derivative in ('card', 'full'):
+            with self.subTest(derivative=derivative):
+                recipes = self.assert_same_content(AnonymousUser(),
+                                                   derivative)
+                self.assertFalse(any(
+                    recipe['is_favorited'] or recipe['is_in_shopping_cart']
+                    or recipe['author']['is_subscribed']
+                    for recipe in recipes
+                ))
+
+    def test_authenticated(self):
+        for derivative in ('card', 'full'):
+            with self.subTest(derivative=derivative):
+                recipes = self.assert_same_content(self.reader, derivative)
+                self.assertEqual(
+                    [(recipe['is_favorited'], recipe['is_in_shopping_cart'])
+                     for recipe in recipes],
+                    [(False, True), (False, False), (True, True)],
+                )
+                self.assertTrue(recipes[0]['author']['is_subscribed'])
+
+    def test_counters_are_not_shown(self):
+        recipe = self.assert_same_content(AnonymousUser(), 'card')[0]
+        self.assertNotIn('favorites_count', recipe)
+        self.assertNotIn('in_carts_count', recipe)
+
+    def test_popular_order_follows_counters(self):
+        def get_ids():
+            response = APIClient().get(
+                '/api/recipes/', {'ordering': 'popular'},
+            )
+            return [recipe['id'] for recipe in response.data['results']]
+
+        before = get_ids()
+        with self.captureOnCommitCallbacks(execute=True):
+            add_marks(self.author, Favorite, (before[-1],))
+            add_marks(self.reader, ShoppingCart, (before[-1],))
+        self.assertEqual(get_ids()[0], before[-1])
+
+    def test_counters_keep_date_ordered_lists_cached(self):
+        client = APIClient()
+        client.get('/api/recipes/')
+        recipe_id = Recipe.objects.order_by('pub_date').first().id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(add_marks(self.author, Favorite, (recipe_id,)))
+        with self.assertNumQueries(0):
+            self.assertEqual(client.get('/api/recipes/').status_code, 200)
+
+    def test_image_derivatives(self):
+        images = {
+            derivative: [
+                recipe['image'] for recipe in
+                self.assert_same_content(AnonymousUser(), derivative)
+            ]
+            for derivative in ('card', 'full')
+        }
+        self.assertEqual(images, {
+            'card': [None, 'http://testserver/media/recipes/images/shchi.png',
+                     'http://testserver/media/recipes/images/'
+                     'borsch_card.jpg'],
+            'full': [None, 'http://testserver/media/recipes/images/shchi.png',
+                     'http://testserver/media/recipes/images/'
+                     'borsch_full.jpg'],
+        })
+
+    def test_endpoints(self):
+        for user in (None, self.reader):
+            client = APIClient()
+            client.force_authenticate(user)
+            request = self.get_request(user or AnonymousUser())
+            view = RecipeViewSet(request=request, format_kwarg=None,
+                                 kwargs={})
+            queryset = view.get_queryset()
+            with self.subTest(user=user, action='list'):
+                response = client.get('/api/recipes/')
+                expected = RecipeSerializer(
+                    queryset, many=True,
+                    context={'request': request, 'image_derivative': 'card'},
+                ).data
+                self.assertEqual(response.json()['results'],
+                                 json.loads(JSONRenderer().render(expected)))
+            recipe = queryset.last()
+            with self.subTest(user=user, action='retrieve'):
+                response = client.get(f'/api/recipes/{recipe.id}/')
+                expected = RecipeSerializer(
+                    recipe,
+                    context={'request': request, 'image_derivative': 'full'},
+                ).data
+                self.assertEqual(response.content,
+                                 JSONRenderer().render(expected))
+
+
+class SearchCursorTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user('author')
+        cls.recipes = [
+            create_recipe(author, name=name) for name in (
+                'Суп', 'Суп гороховый', 'Суп суп', 'Щи', 'Суп рыбный',
+                'Суп грибной', 'Каша',
+            )
+        ]
+
+    def get_ids(self, params):
+        url, ids = '/api/recipes/', []
+        while url:
+            response = APIClient().get(url, params)
+            self.assertEqual(response.status_code, 200)
+            ids += [recipe['id'] for recipe in response.data['results']]
+            url, params = response.data['next'], None
+        return ids
+
+    def test_cursor_keeps_search_order(self):
+        expected = self.get_ids({'search': 'суп', 'limit': 10})
+        self.assertEqual(len(expected), 5)
+        ids = self.get_ids({'search': 'суп', 'limit': 2, 'cursor': ''})
+        self.assertEqual(ids, expected)
+        response = APIClient().get(
+            '/api/recipes/', {'search': 'суп', 'limit': 2, 'cursor': ''},
+        )
+        response = APIClient().get(response.data['next'])
+        response = APIClient().get(response.data['previous'])
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            expected[:2],
+        )
+
+
+def make_image(size=(64, 48)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 40, 40)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class ImageTest(TestCase):
+
+    def test_wrapped_base64(self):
+        encoded = base64.encodebytes(make_image((400, 300))).decode()
+        self.assertIn('\n', encoded)
+        file = Base64ImageField().to_internal_value(
+            f'data:image/png;base64,\n{encoded}  ',
+        )
+        self.assertEqual(file.image.size, (400, 300))
+
+    def test_old_derivatives_deleted_after_commit(self):
+        with tempfile.TemporaryDirectory() as media_root:
+            with override_settings(MEDIA_ROOT=media_root):
+                recipe = create_recipe(create_user('author'))
+                recipe.image.save('dish.png', ContentFile(make_image()))
+                update_recipe_derivatives(recipe)
+                old_paths = [
+                    os.path.join(media_root, name)
+                    for name in recipe.image_derivatives.values()
+                ]
+                recipe.image.save('dish.png', ContentFile(make_image()))
+                with self.captureOnCommitCallbacks() as callbacks:
+                    update_recipe_derivatives(recipe)
+                self.assertTrue(all(map(os.path.exists, old_paths)))
+                for callback in callbacks:
+                    callback()
+                self.assertFalse(any(map(os.path.exists, old_paths)))
+
+
+class RecipeUpdateTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        cls.recipe = create_recipe(cls.user)
+        unit = ComponentUnit.objects.get()
+        cls.components = [
+            Component.objects.create(name=f'продукт {number}', unit=unit)
+            for number in range(6)
+        ]
+        RecipeComponent.objects.bulk_create(
+            RecipeComponent(recipe=cls.recipe, component=component,
+                            amount=10)
+            for component in cls.components
+        )
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def patch_ingredients(self, components):
+        return self.client.patch(
+            f'/api/recipes/{self.recipe.id}/',
+            {'ingredients': [{'id': component.id, 'amount': 20}
+                             for component in components]},
+            format='json',
+        )
+
+    def test_removed_ingredients_are_applied_in_bulk(self):
+        with mock.patch('recipes.signals.update_search_index',
+                        wraps=update_search_index) as update_index, \
+                self.assertNumQueries(22):
+            response = self.patch_ingredients(self.components[:1])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(update_index.call_count, 1)
+        self.assertEqual(
+            list(ShoppingListItem.objects.values_list('component', 'amount')),
+            [(self.components[0].id, 20)],
+        )
+
+
+class TokenCacheTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        cls.token = Token.objects.create(user=cls.user)
+        cls.key = cls.token.key
+
+    def setUp(self):
+        cache.clear()
+        # Кэш токенов другого воркера, сигналы его не видят.
+        patcher = mock.patch('api.authentication.token_cache', TokenCache())
+        self.addCleanup(patcher.stop)
+        patcher.start()
+
+    def authenticate(self):
+        return CachedTokenAuthentication().authenticate_credentials(self.key)
+
+    def test_cached_token(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate()[0].id, self.user.id)
+
+    def test_deleted_token(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_inactive_user(self):
+        self.authenticate()
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+
+class RecipeListQueriesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        tags = [Tag.objects.create(name=name, color=color)
+                for name, color in (('завтрак', '#E26C2D'),
+                                    ('ужин', '#49B64E'))]
+        unit = ComponentUnit.objects.create(name='шт', slug='pcs')
+        components = [
+            Component.objects.create(name=f'продукт {number}', unit=unit)
+            for number in range(4)
+        ]
+        for author_number in range(3):
+            author = create_user(f'author{author_number}')
+            for recipe_number in range(2):
+                recipe = create_recipe(
+                    author, name=f'Рецепт {author_number}.{recipe_number}',
+                )
+                recipe.tags.set(tags)
+                RecipeComponent.objects.bulk_create(
+                    RecipeComponent(recipe=recipe, component=component,
+                                    amount=10)
+                    for component in components
+                )
+        Subscription.objects.create(user=cls.reader, author=author)
+        add_marks(cls.reader, Favorite, (recipe.id,))
+
+    def setUp(self):
+        cache.clear()
+
+    def assert_list_queries(self, client, number):
+        with self.assertNumQueries(number):
+            response = client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 6)
+
+    def test_anonymous(self):
+        self.assert_list_queries(APIClient(), 5)
+
+    def test_authenticated(self):
+        client = APIClient()
+        client.force_authenticate(self.reader)
+        self.assert_list_queries(client, 6)
+
+    def test_serializer(self):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = self.reader
+        view = RecipeViewSet(request=request, format_kwarg=None, kwargs={})
+        with self.assertNumQueries(4):
+            recipes = RecipeSerializer(
+                view.get_queryset(), many=True, context={'request': request},
+            ).data
+        self.assertEqual(len(recipes), 6)
@@ -3,10 +3,12 @@ from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
+from api.fields import Base64ImageField
 from recipes.models import Recipe
 
 from users.models import Subscription, User
 from users.validators import validate_username
+from .utils import get_recipes_limit, get_subscribed_ids
 
 
 class SignUpSerializer(UserCreateSerializer):
@@ -52,13 +54,15 @@ class UserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        if not user.is_authenticated:
-            return False
-        return obj.subscribing.filter(user=user).exists()
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        request = self.context.get('request')
+        return obj.id in get_subscribed_ids(request)
 
 
 class SubscriptionRecipeSerializer(serializers.ModelSerializer):
+    image = Base64ImageField(read_only=True, derivative='thumbnail')
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
@@ -66,10 +70,7 @@ class SubscriptionRecipeSerializer(serializers.ModelSerializer):
 
 class SubscriptionUserSerializer(UserSerializer):
     recipes = serializers.SerializerMethodField(read_only=True,)
-    recipes_count = serializers.IntegerField(
-        source='recipes.count',
-        read_only=True,
-    )
+    recipes_count = serializers.SerializerMethodField(read_only=True,)
 
     class Meta:
         model = User
@@ -83,17 +84,23 @@ class SubscriptionUserSerializer(UserSerializer):
         )
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        if limit:
-            recipes = obj.recipes.all()[:(int(limit))]
-        else:
+        recipes = getattr(obj, 'limited_recipes', None)
+        if recipes is None:
+            request = self.context.get('request')
+            limit = get_recipes_limit(request)
             recipes = obj.recipes.all()
+            if limit is not None:
+                recipes = recipes[:limit]
         serializer = SubscriptionRecipeSerializer(
             recipes, many=True, read_only=True,
         )
         return serializer.data
 
+    def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
+        return obj.recipes.count()
+
 
 class SubscriptionSerializer(serializers.ModelSerializer):
     class Meta:
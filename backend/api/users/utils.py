@@ -0,0 +1,57 @@
+from django.db.models import F, Prefetch, Window, prefetch_related_objects
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from rest_framework.exceptions import ValidationError
+
+from recipes.models import Recipe
+from users.models import Subscription
+
+
+def get_subscribed_ids(request):
+    user = request.user
+    if not user.is_authenticated:
+        return frozenset()
+    subscribed_ids = getattr(request, '_subscribed_ids', None)
+    if subscribed_ids is None:
+        subscribed_ids = frozenset(
+            Subscription.objects.filter(
+                user=user
+            ).values_list('author_id', flat=True)
+        )
+        request._subscribed_ids = subscribed_ids
+    return subscribed_ids
+
+
+def get_recipes_limit(request):
+    limit = request.query_params.get('recipes_limit')
+    if not limit:
+        return None
+    try:
+        limit = int(limit)
+    except ValueError:
+        limit = -1
+    if limit < 0:
+        raise ValidationError({
+            'recipes_limit': 'Должно быть целым неотрицательным числом'
+        })
+    return limit
+
+
+def prefetch_author_recipes(authors, limit=None):
+    recipes = Recipe.objects.filter(author__in=authors)
+    if limit is not None:
+        ranked = recipes.annotate(recipe_rank=Window(
+            RowNumber(),
+            partition_by=F('author_id'),
+            order_by=(F('pub_date').desc(), F('id').desc()),
+        )).values('id', 'recipe_rank')
+        sql, params = ranked.query.sql_with_params()
+        recipes = Recipe.objects.filter(id__in=RawSQL(
+            f'SELECT id FROM ({sql}) ranked WHERE recipe_rank <= %s',
+            (*params, limit),
+        ))
+    prefetch_related_objects(authors, Prefetch(
+        'recipes',
+        queryset=recipes.order_by('-pub_date', '-id'),
+        to_attr='limited_recipes',
+    ))
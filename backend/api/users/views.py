@@ -1,5 +1,7 @@
 from djoser.views import UserViewSet
 from djoser.serializers import SetPasswordSerializer
+from django.db import transaction
+from django.db.models import Count, Value
 from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.decorators import action
@@ -7,10 +9,12 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import viewsets
 
-from foodgram.pagination import CustomPagination
+from foodgram.pagination import CustomPagination, SubscriptionPagination
+from recipes.feed import add_author_to_feed, remove_author_from_feed
 from users.models import Subscription, User
 from .serializers import (SignUpSerializer, SubscriptionSerializer,
                           SubscriptionUserSerializer, UserSerializer,)
+from .utils import get_recipes_limit, prefetch_author_recipes
 
 
 class CustomUserViewSet(UserViewSet):
@@ -25,13 +29,21 @@ class CustomUserViewSet(UserViewSet):
             return SetPasswordSerializer
         return SignUpSerializer
 
-    @action(('get',), permission_classes=(IsAuthenticated,), detail=False,)
+    @action(
+        ('get',), permission_classes=(IsAuthenticated,), detail=False,
+        pagination_class=SubscriptionPagination,
+    )
     def subscriptions(self, request):
         user = request.user
+        limit = get_recipes_limit(request)
         subscriptions = User.objects.filter(
             subscribing__user=user
-        ).prefetch_related('recipes')
+        ).annotate(
+            is_subscribed=Value(True),
+            recipes_count=Count('recipes'),
+        ).order_by('role', 'username')
         page = self.paginate_queryset(subscriptions)
+        prefetch_author_recipes(page, limit)
         serializer = SubscriptionUserSerializer(
             page, many=True, context={'request': request}
         )
@@ -46,6 +58,7 @@ class UserSubscribeViewSet(viewsets.ViewSet):
     def create(self, request, *args, **kwargs):
         id = kwargs['pk']
         user = request.user
+        limit = get_recipes_limit(request)
         author = get_object_or_404(User, pk=id)
 
         data = {
@@ -54,7 +67,10 @@ class UserSubscribeViewSet(viewsets.ViewSet):
         }
         serializer = SubscriptionSerializer(data=data)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        with transaction.atomic():
+            serializer.save()
+            add_author_to_feed(user.id, author.id)
+        prefetch_author_recipes((author,), limit)
         serializer = SubscriptionUserSerializer(
             author, context={'request': request}
         )
@@ -64,9 +80,11 @@ class UserSubscribeViewSet(viewsets.ViewSet):
         id = kwargs['pk']
         user = request.user
         author = get_object_or_404(User, pk=id)
-        get_object_or_404(
-            Subscription, author=author, user=user,
-        ).delete()
+        with transaction.atomic():
+            get_object_or_404(
+                Subscription, author=author, user=user,
+            ).delete()
+            remove_author_from_feed(user.id, author.id)
         message = {
             'detail': 'Вы отписались'
         }
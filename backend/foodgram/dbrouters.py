@@ -0,0 +1,81 @@
+import asyncio
+import random
+from contextvars import ContextVar
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import cache
+
+STICKY_KEY = 'db:primary:{}'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Вне запросов (команды, воркер задач) всё читается с основной базы.
+use_primary = ContextVar('use_primary', default=True)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if settings.DATABASE_REPLICAS and not use_primary.get():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+def get_sticky_key(request):
+    credentials = (request.META.get('HTTP_AUTHORIZATION')
+                   or request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+    if not credentials:
+        return None
+    return STICKY_KEY.format(sha256(credentials.encode()).hexdigest())
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        key, token = self.route(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            use_primary.reset(token)
+        self.stick(request, key)
+        return response
+
+    async def __acall__(self, request):
+        key, token = self.route(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            use_primary.reset(token)
+        self.stick(request, key)
+        return response
+
+    @staticmethod
+    def route(request):
+        key = get_sticky_key(request)
+        primary = (request.method not in SAFE_METHODS
+                   or (key is not None and bool(cache.get(key))))
+        return key, use_primary.set(primary)
+
+    @staticmethod
+    def stick(request, key):
+        if request.method not in SAFE_METHODS and key is not None:
+            cache.set(key, True, timeout=settings.REPLICA_STICKY_TIMEOUT)
@@ -0,0 +1,56 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar, copy_context
+from functools import partial
+from itertools import count
+
+from django.conf import settings
+from django.db import close_old_connections
+
+# У каждого потока пула своё соединение с БД, поэтому размер пула
+# ограничивает и число соединений, открытых одним процессом.
+orm_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_ORM_THREADS, thread_name_prefix='orm',
+)
+
+_request_ids = count(1)
+_current_request = ContextVar('orm_request', default=None)
+_thread_state = threading.local()
+
+
+def start_request():
+    _current_request.set(next(_request_ids))
+
+
+def _call(func, args, kwargs):
+    # Устаревшие соединения закрываются один раз за запрос в каждом потоке,
+    # как это делают сигналы request_started/request_finished для WSGI.
+    # Вызовы вне запроса проверяют соединение каждый раз.
+    request_id = _current_request.get()
+    last_request_id = getattr(_thread_state, 'request_id', None)
+    if request_id is None or request_id != last_request_id:
+        close_old_connections()
+        _thread_state.request_id = request_id
+    return func(*args, **kwargs)
+
+
+async def run_orm(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # Контекст копируется, чтобы в поток попали use_primary и статистика
+    # запросов текущего запроса.
+    return await loop.run_in_executor(
+        orm_executor, partial(copy_context().run, _call, func, args, kwargs),
+    )
+
+
+async def gather_orm(*calls):
+    results = await asyncio.gather(
+        *(run_orm(*call) for call in calls), return_exceptions=True,
+    )
+    # Ошибки поднимаются в порядке вызовов, а не завершения: так 404
+    # основного объекта важнее ошибок вспомогательных запросов.
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
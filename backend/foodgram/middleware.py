@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import re
+from collections import Counter
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDERS = re.compile(r'\((?:%s, )+%s\)')
+SHAPE_LENGTH = 200
+TOP_SHAPES = 3
+
+# Статистика текущего запроса; переходит вместе с контекстом в потоки
+# sync_to_async и пула ORM, поэтому учитываются запросы из любого потока.
+current_stats = ContextVar('current_stats', default=None)
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.queries = Counter()
+        self._lock = Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = perf_counter() - start
+            with self._lock:
+                self.duration += duration
+                self.count += 1
+                self.queries[sql] += 1
+
+    def get_shapes(self):
+        shapes = Counter()
+        for sql, cnt in self.queries.items():
+            shapes[PLACEHOLDERS.sub('(...)', sql)[:SHAPE_LENGTH]] += cnt
+        return shapes.most_common(TOP_SHAPES)
+
+    def get_repeated(self):
+        sql, cnt = self.queries.most_common(1)[0] if self.queries else ('', 0)
+        return sql[:SHAPE_LENGTH], cnt
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+def track_connection_queries(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def get_view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.view_name:
+        return request.path
+    return match.view_name
+
+
+class QueryTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Запросы считаются только при подключённом middleware.
+        connection_created.connect(track_connection_queries)
+        for connection in connections.all():
+            track_connection_queries(None, connection)
+        if asyncio.iscoroutinefunction(get_response):
+            # Как в MiddlewareMixin: Django проверяет это при сборке цепочки.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        stats = QueryStats()
+        start = perf_counter()
+        token = current_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats, start)
+
+    async def __acall__(self, request):
+        stats = QueryStats()
+        start = perf_counter()
+        token = current_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats, start)
+
+    def finish(self, request, response, stats, start):
+        duration = perf_counter() - start
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'db;dur={stats.duration * 1000:.1f};'
+                f'desc="{stats.count} queries", '
+                f'total;dur={duration * 1000:.1f}'
+            )
+        self.report(request, stats, duration)
+        return response
+
+    def report(self, request, stats, duration):
+        view = get_view_name(request)
+        sql, repeated = stats.get_repeated()
+        if repeated >= settings.N_PLUS_ONE_THRESHOLD:
+            logger.warning(
+                'Возможный N+1 в %s %s: запрос повторён %s раз: %s',
+                request.method, view, repeated, sql,
+            )
+        if (duration * 1000 < settings.SLOW_REQUEST_THRESHOLD
+                and stats.count < settings.QUERY_COUNT_THRESHOLD):
+            return
+        shapes = '\n'.join(
+            f'  {cnt} x {shape}' for shape, cnt in stats.get_shapes()
+        )
+        logger.warning(
+            'Медленный запрос %s %s: %.1f мс, %s запросов к БД за %.1f мс\n%s',
+            request.method, view, duration * 1000, stats.count,
+            stats.duration * 1000, shapes,
+        )
@@ -0,0 +1,15 @@
+class CounterFieldsMixin:
+    COUNTER_FIELDS = ()
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields,
+                   forced_update):
+        # Счётчики меняются только через F(), полное сохранение
+        # не должно затирать их устаревшими значениями.
+        if update_fields is None:
+            values = [
+                value for value in values
+                if value[0].name not in self.COUNTER_FIELDS
+            ]
+        return super()._do_update(
+            base_qs, using, pk_val, values, update_fields, forced_update,
+        )
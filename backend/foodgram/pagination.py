@@ -1,6 +1,203 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from types import SimpleNamespace
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from recipes.feed import (get_fan_out_on_read_recipes, get_feed,
+                          get_feed_items)
 
 
 class CustomPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+
+
+class KeysetPagination(CustomPagination):
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    ordering = ('-pub_date', '-id',)
+    cursor_only = False
+    invalid_cursor_message = 'Неверный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = (self.cursor_only
+                           or self.cursor_query_param in request.query_params)
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.model = queryset.model
+        self.annotations = queryset.query.annotations
+        self.ordering = self.get_queryset_ordering(queryset)
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+        ordering = self.get_ordering(reverse)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count = self.get_count(queryset)
+
+        results = self.get_page(queryset, ordering, position, page_size + 1)
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.results = results
+        return results
+
+    def get_count(self, queryset):
+        return queryset.count()
+
+    def get_page(self, queryset, ordering, position, limit):
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(
+                self.get_keyset_filter(ordering, position)
+            )
+        return list(queryset[:limit])
+
+    def get_cursor_field(self, name):
+        # Кроме полей модели курсор хранит аннотации из сортировки,
+        # например ранг поиска.
+        if name in self.annotations:
+            return self.annotations[name].output_field
+        return self.model._meta.get_field(name)
+
+    def get_queryset_ordering(self, queryset):
+        ordering = tuple(queryset.query.order_by)
+        try:
+            fields = [
+                self.get_cursor_field(field.lstrip('-'))
+                for field in ordering
+            ]
+        except (AttributeError, FieldDoesNotExist):
+            return type(self).ordering
+        if not fields or not fields[-1].unique:
+            return type(self).ordering
+        return ordering
+
+    def get_ordering(self, reverse=False):
+        if not reverse:
+            return self.ordering
+        return tuple(
+            field[1:] if field.startswith('-') else f'-{field}'
+            for field in self.ordering
+        )
+
+    @staticmethod
+    def get_keyset_filter(ordering, position):
+        keyset_filter = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            keyset_filter |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return keyset_filter
+
+    def encode_cursor(self, obj, reverse):
+        if isinstance(obj, dict):
+            # Строка из values().
+            obj = SimpleNamespace(**obj)
+        position = [
+            getattr(obj, name) if name in self.annotations
+            else self.model._meta.get_field(name).value_to_string(obj)
+            for name in (field.lstrip('-') for field in self.ordering)
+        ]
+        data = json.dumps({'p': position, 'r': reverse})
+        token = urlsafe_b64encode(data.encode()).decode()
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            data = json.loads(urlsafe_b64decode(token.encode()))
+            if len(data['p']) != len(self.ordering):
+                raise ValueError
+            position = [
+                self.get_cursor_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, data['p'])
+            ]
+            return position, bool(data['r'])
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.use_cursor:
+            return super().get_next_link()
+        if not self.has_next or not self.results:
+            return None
+        return self.encode_cursor(self.results[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.use_cursor:
+            return super().get_previous_link()
+        if not self.has_previous or not self.results:
+            return None
+        return self.encode_cursor(self.results[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.get_next_link()
+        response['previous'] = self.get_previous_link()
+        response['results'] = data
+        return Response(response)
+
+
+class SubscriptionPagination(KeysetPagination):
+    ordering = ('role', 'username', 'id',)
+
+
+class FeedPagination(KeysetPagination):
+    cursor_only = True
+    # Поля записи ленты, соответствующие полям сортировки рецептов.
+    item_fields = {'pub_date': 'pub_date', 'id': 'recipe_id'}
+
+    def get_queryset_ordering(self, queryset):
+        return type(self).ordering
+
+    def get_count(self, queryset):
+        return get_feed(queryset, self.request.user).count()
+
+    def get_page(self, queryset, ordering, position, limit):
+        # Страница листается по индексу записей ленты пользователя,
+        # рецепты авторов без рассылки добавляются отдельным запросом.
+        user = self.request.user
+        item_ordering = tuple(
+            ('-' if field.startswith('-') else '')
+            + self.item_fields[field.lstrip('-')]
+            for field in ordering
+        )
+        keys = super().get_page(
+            get_feed_items(queryset, user).values_list(
+                'pub_date', 'recipe_id',
+            ),
+            item_ordering, position, limit,
+        )
+        keys += super().get_page(
+            get_fan_out_on_read_recipes(queryset, user)
+            .prefetch_related(None).values_list('pub_date', 'id'),
+            ordering, position, limit,
+        )
+        keys = sorted(
+            set(keys), reverse=ordering[0].startswith('-'),
+        )[:limit]
+        recipes = queryset.in_bulk([pk for _, pk in keys])
+        return [recipes[pk] for _, pk in keys if pk in recipes]
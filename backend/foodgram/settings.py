@@ -25,9 +25,12 @@ INSTALLED_APPS = [
     'recipes.apps.RecipesConfig',
     'api.apps.ApiConfig',
     'users.apps.UsersConfig',
+    'jobs.apps.JobsConfig',
 ]
 
 MIDDLEWARE = [
+    'foodgram.middleware.QueryTimingMiddleware',
+    'foodgram.dbrouters.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,6 +67,7 @@ if DEBUG:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 0)),
         }
     }
 else:
@@ -74,10 +78,52 @@ else:
             'USER': os.getenv('POSTGRES_USER', 'foodgram'),
             'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'foodgram'),
             'HOST': os.getenv('DB_HOST', 'foodgram'),
-            'PORT': os.getenv('DB_PORT', 5432)
+            'PORT': os.getenv('DB_PORT', 5432),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 0)),
         }
     }
 
+for number, replica in enumerate(os.getenv('DB_REPLICAS', '').split(), 1):
+    if DATABASES['default']['ENGINE'].endswith('sqlite3'):
+        replica_settings = {'NAME': replica}
+    else:
+        host, _, port = replica.partition(':')
+        replica_settings = {'HOST': host, 'PORT': port or 5432}
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'], **replica_settings,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['foodgram.dbrouters.ReplicaRouter']
+REPLICA_STICKY_TIMEOUT = int(os.getenv('REPLICA_STICKY_TIMEOUT', 5))
+
+ASYNC_VIEWS = bool(strtobool(os.getenv('ASYNC_VIEWS', 'False')))
+ASYNC_ORM_THREADS = int(os.getenv('ASYNC_ORM_THREADS', 10))
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
+    }
+}
+
+ANONYMOUS_CACHE_TIMEOUT = int(os.getenv('ANONYMOUS_CACHE_TIMEOUT', 60))
+
+REFERENCE_CACHE_TIMEOUT = int(os.getenv('REFERENCE_CACHE_TIMEOUT', 300))
+
+FRAGMENT_CACHE_TIMEOUT = int(os.getenv('FRAGMENT_CACHE_TIMEOUT', 3600))
+
+SERVER_TIMING = bool(strtobool(os.getenv('SERVER_TIMING', str(DEBUG))))
+SLOW_REQUEST_THRESHOLD = int(os.getenv('SLOW_REQUEST_THRESHOLD', 500))
+QUERY_COUNT_THRESHOLD = int(os.getenv('QUERY_COUNT_THRESHOLD', 30))
+N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', 10))
+
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 1024))
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', 60))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -109,6 +155,15 @@ STATIC_ROOT = BASE_DIR / "static"
 MEDIA_URL = os.getenv('MEDIA_URL', '/media/')
 MEDIA_ROOT = BASE_DIR / 'media'
 
+IMAGE_MAX_UPLOAD_SIZE = int(os.getenv('IMAGE_MAX_UPLOAD_SIZE', 10 * 1024 * 1024))
+IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS', 40_000_000))
+IMAGE_WEBP_DERIVATIVES = bool(strtobool(os.getenv('IMAGE_WEBP_DERIVATIVES', 'True')))
+
+JOBS_ALWAYS_EAGER = bool(strtobool(os.getenv('JOBS_ALWAYS_EAGER', 'False')))
+
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', 10000))
+FEED_BACKFILL_SIZE = int(os.getenv('FEED_BACKFILL_SIZE', 100))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
@@ -116,7 +171,11 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': None,
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
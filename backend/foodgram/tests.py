@@ -0,0 +1,143 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connections
+from django.test import (SimpleTestCase, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import token_cache
+from foodgram import executor
+from recipes.models import Recipe
+from recipes.tests import create_recipe, create_user
+
+REPLICA = 'replica'
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA], REPLICA_STICKY_TIMEOUT=60)
+class ReplicaRoutingTest(TransactionTestCase):
+    # Реплика - отдельный файл SQLite с копией основной базы на момент
+    # setUp, поэтому записанное позже видно только на основной.
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        handle, cls.replica_path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        connections.databases[REPLICA] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': cls.replica_path,
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+        os.remove(cls.replica_path)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.user = create_user('user')
+        self.token = Token.objects.create(user=self.user)
+        self.recipe = create_recipe(self.user)
+        connections[REPLICA].close()
+        replica = sqlite3.connect(self.replica_path)
+        try:
+            connections['default'].ensure_connection()
+            connections['default'].connection.backup(replica)
+        finally:
+            replica.close()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+        self.fresh = create_recipe(self.user, name='Щи')
+
+    def get_recipe_ids(self, client):
+        response = client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_safe_methods_read_from_replica(self):
+        with CaptureQueriesContext(connections[REPLICA]) as queries:
+            self.assertEqual(self.get_recipe_ids(APIClient()),
+                             [self.recipe.id])
+            self.assertEqual(self.get_recipe_ids(self.client),
+                             [self.recipe.id])
+        self.assertTrue(queries.captured_queries)
+
+    def test_unsafe_methods_use_primary(self):
+        with CaptureQueriesContext(connections[REPLICA]) as queries:
+            response = self.client.post(
+                f'/api/recipes/{self.fresh.id}/favorite/',
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(queries.captured_queries, [])
+        self.assertEqual(
+            Recipe.objects.using('default').get(id=self.fresh.id)
+            .favorites_count, 1,
+        )
+
+    def test_reads_after_write_use_primary(self):
+        response = self.client.post(f'/api/recipes/{self.recipe.id}/favorite/')
+        self.assertEqual(response.status_code, 201)
+        with CaptureQueriesContext(connections[REPLICA]) as queries:
+            self.assertEqual(self.get_recipe_ids(self.client),
+                             [self.fresh.id, self.recipe.id])
+            response = self.client.get(f'/api/recipes/{self.fresh.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries.captured_queries, [])
+        self.assertEqual(
+            APIClient().get(f'/api/recipes/{self.fresh.id}/').status_code,
+            404,
+        )
+        # Окно закрепления истекло.
+        cache.clear()
+        self.assertEqual(self.get_recipe_ids(self.client), [self.recipe.id])
+
+
+class ExecutorTest(SimpleTestCase):
+
+    def setUp(self):
+        pool = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(pool.shutdown)
+        for target, value in (('orm_executor', pool),
+                              ('close_old_connections', mock.Mock())):
+            patcher = mock.patch.object(executor, target, value)
+            self.addCleanup(patcher.stop)
+            patcher.start()
+
+    async def handle_request(self):
+        executor.start_request()
+        for _ in range(3):
+            await executor.run_orm(int)
+
+    def test_connections_are_checked_once_per_request(self):
+        asyncio.run(self.handle_request())
+        self.assertEqual(executor.close_old_connections.call_count, 1)
+        asyncio.run(self.handle_request())
+        self.assertEqual(executor.close_old_connections.call_count, 2)
+
+
+class QueryTimingTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(SERVER_TIMING=True)
+    def test_server_timing_counts_queries(self):
+        response = APIClient().get('/api/tags/')
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+    @override_settings(SERVER_TIMING=False)
+    def test_server_timing_disabled(self):
+        response = APIClient().get('/api/tags/')
+        self.assertFalse(response.has_header('Server-Timing'))
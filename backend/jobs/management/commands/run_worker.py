@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, no_translations
+
+from api.cache import is_cache_shared
+from jobs.worker import work
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help='Число задач, выполняемых одновременно',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1,
+            help='Пауза между опросами пустой очереди, сек',
+        )
+        parser.add_argument(
+            '--lock-timeout', type=int, default=600,
+            help='Через сколько секунд зависшая задача берётся повторно',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить накопившиеся задачи и завершиться',
+        )
+
+    @no_translations
+    def handle(self, *args, **options):
+        self.stdout.write('Воркер запущен')
+        if not is_cache_shared():
+            self.stderr.write(
+                'Кэш воркера не общий с веб-процессами: они не узнают '
+                'об изменениях рецептов из задач, задайте CACHE_BACKEND'
+            )
+        processed = work(
+            concurrency=options['concurrency'],
+            lock_timeout=options['lock_timeout'],
+            poll_interval=options['poll_interval'],
+            once=options['once'],
+        )
+        self.stdout.write(f'Выполнено задач: {processed}')
@@ -0,0 +1,42 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Ожидает'
+        RUNNING = 'running', 'Выполняется'
+        DONE = 'done', 'Выполнена'
+        FAILED = 'failed', 'Ошибка'
+
+    name = models.CharField(max_length=128, verbose_name='Задача',)
+    args = models.JSONField(default=list, blank=True,
+                            verbose_name='Аргументы',)
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.PENDING,
+        verbose_name='Статус',
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0, verbose_name='Попыток',)
+    max_attempts = models.PositiveSmallIntegerField(
+        default=3, verbose_name='Максимум попыток',)
+    run_at = models.DateTimeField(default=timezone.now,
+                                  verbose_name='Запустить после',)
+    locked_at = models.DateTimeField(null=True, blank=True,
+                                     verbose_name='Взята в работу',)
+    last_error = models.TextField(blank=True, verbose_name='Ошибка',)
+    created = models.DateTimeField(auto_now_add=True,
+                                   verbose_name='Создана',)
+
+    class Meta:
+        ordering = ('run_at', 'id',)
+        indexes = (
+            models.Index(fields=('status', 'run_at'),
+                         name='job_status_run_at_idx'),
+        )
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+
+    def __str__(self):
+        return f'{self.name}{tuple(self.args)} - {self.status}'
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.db import transaction
+
+from .models import Job
+
+JOBS = {}
+
+
+def job(name, max_attempts=3):
+    def decorator(func):
+        func.job_name = name
+        func.max_attempts = max_attempts
+        func.enqueue = lambda *args: enqueue(name, *args)
+        JOBS[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, *args):
+    if name not in JOBS:
+        raise KeyError(f'Неизвестная задача {name}')
+    if settings.JOBS_ALWAYS_EAGER:
+        transaction.on_commit(lambda: JOBS[name](*args))
+        return None
+    # Задача создаётся в текущей транзакции и становится видна
+    # воркеру только после её фиксации.
+    return Job.objects.create(
+        name=name, args=list(args), max_attempts=JOBS[name].max_attempts,
+    )
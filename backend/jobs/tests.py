@@ -0,0 +1,59 @@
+import threading
+import time
+
+from django.test import TransactionTestCase
+
+from .models import Job
+from .registry import job
+from .worker import claim_jobs, work
+
+slow_job_released = threading.Event()
+fast_jobs_done = []
+reclaimed = []
+
+
+@job('tests.slow')
+def slow():
+    # Быстрые задачи должны выполниться, пока занят один слот.
+    if not slow_job_released.wait(timeout=5):
+        raise TimeoutError
+
+
+@job('tests.fast')
+def fast(number, total):
+    fast_jobs_done.append(number)
+    if len(fast_jobs_done) == total:
+        slow_job_released.set()
+
+
+@job('tests.long')
+def long(lock_timeout):
+    time.sleep(lock_timeout * 2)
+    reclaimed.extend(claim_jobs(1, lock_timeout))
+
+
+class WorkerTest(TransactionTestCase):
+
+    def setUp(self):
+        slow_job_released.clear()
+        fast_jobs_done.clear()
+        reclaimed.clear()
+
+    def test_free_slots_are_refilled(self):
+        slow.enqueue()
+        for number in range(3):
+            fast.enqueue(number, 3)
+        self.assertEqual(
+            work(concurrency=2, poll_interval=0.01, once=True), 4,
+        )
+        self.assertEqual(sorted(fast_jobs_done), [0, 1, 2])
+        self.assertEqual(
+            set(Job.objects.values_list('status', flat=True)),
+            {Job.Status.DONE},
+        )
+
+    def test_running_job_lock_is_extended(self):
+        long.enqueue(0.3)
+        work(concurrency=1, lock_timeout=0.3, poll_interval=0.01, once=True)
+        self.assertEqual(reclaimed, [])
+        self.assertEqual(Job.objects.get().status, Job.Status.DONE)
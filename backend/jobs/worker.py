@@ -0,0 +1,97 @@
+import logging
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job
+from .registry import JOBS
+
+logger = logging.getLogger(__name__)
+
+RETRY_DELAY = 10
+
+
+def claim_jobs(limit, lock_timeout):
+    now = timezone.now()
+    stale = now - timedelta(seconds=lock_timeout)
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.select_for_update(skip_locked=skip_locked).filter(
+                Q(status=Job.Status.PENDING, run_at__lte=now)
+                | Q(status=Job.Status.RUNNING, locked_at__lt=stale)
+            ).order_by('run_at', 'id')[:limit]
+        )
+        Job.objects.filter(id__in=[job.id for job in jobs]).update(
+            status=Job.Status.RUNNING, locked_at=now,
+        )
+    return jobs
+
+
+def run_job(job):
+    close_old_connections()
+    try:
+        JOBS[job.name](*job.args)
+    except Exception:
+        attempts = job.attempts + 1
+        failed = attempts >= job.max_attempts or job.name not in JOBS
+        Job.objects.filter(id=job.id).update(
+            status=Job.Status.FAILED if failed else Job.Status.PENDING,
+            attempts=attempts,
+            run_at=timezone.now() + timedelta(
+                seconds=RETRY_DELAY * 2 ** (attempts - 1)
+            ),
+            locked_at=None,
+            last_error=traceback.format_exc(),
+        )
+        logger.exception('Задача %s #%s завершилась ошибкой',
+                         job.name, job.id)
+        return False
+    else:
+        Job.objects.filter(id=job.id).update(
+            status=Job.Status.DONE, attempts=job.attempts + 1,
+            locked_at=None,
+        )
+        return True
+    finally:
+        close_old_connections()
+
+
+def extend_locks(job_ids):
+    Job.objects.filter(
+        id__in=job_ids, status=Job.Status.RUNNING,
+    ).update(locked_at=timezone.now())
+
+
+def work(concurrency=4, lock_timeout=600, poll_interval=1, once=False):
+    processed = 0
+    running = {}
+    # Блокировка продлевается заранее, чтобы долгую задачу не взял
+    # повторно другой воркер.
+    heartbeat_interval = lock_timeout / 3
+    heartbeat_at = time.monotonic() + heartbeat_interval
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while True:
+            if len(running) < concurrency:
+                for job in claim_jobs(concurrency - len(running),
+                                      lock_timeout):
+                    running[executor.submit(run_job, job)] = job.id
+            if not running:
+                if once:
+                    return processed
+                time.sleep(poll_interval)
+                continue
+            done, _ = wait(
+                running, timeout=poll_interval, return_when=FIRST_COMPLETED,
+            )
+            for future in done:
+                del running[future]
+                processed += 1
+            if running and time.monotonic() >= heartbeat_at:
+                extend_locks(list(running.values()))
+                heartbeat_at = time.monotonic() + heartbeat_interval
@@ -1,7 +1,7 @@
 from django.contrib import admin
 
-from .models import (Component, ComponentUnit, Favorite, Recipe,
-                     ShoppingCart, Tag,)
+from .models import (Component, ComponentUnit, Favorite, FeedItem, Recipe,
+                     ShoppingCart, ShoppingListItem, Tag,)
 
 
 @admin.register(Tag)
@@ -19,12 +19,14 @@ class RecipeComponentInLine(admin.TabularInline):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('author', 'name', 'get_tags',)
+    list_display = ('author', 'name', 'get_tags', 'favorites_count',
+                    'in_carts_count',)
     list_display_links = ('author',)
     list_editable = ('name',)
     list_filter = ('author', 'name', 'tags',)
     empty_value_display = '-пусто-'
     search_fields = ('name', 'cooking_time', 'ingredients__name',)
+    readonly_fields = ('favorites_count', 'in_carts_count',)
     inlines = (RecipeComponentInLine,)
 
     @admin.display(description='Теги')
@@ -66,3 +68,18 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     list_editable = ('recipe',)
     list_filter = ('user',)
     search_fields = ('recipe',)
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'component', 'amount',)
+    list_display_links = ('id',)
+    list_filter = ('user',)
+    search_fields = ('component__name',)
+
+
+@admin.register(FeedItem)
+class FeedItemAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'recipe',)
+    list_display_links = ('id',)
+    list_filter = ('user',)
@@ -0,0 +1,62 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+
+from .models import Favorite, Recipe, ShoppingCart
+
+COUNTERS = {
+    'favorites_count': Favorite,
+    'in_carts_count': ShoppingCart,
+}
+
+# update() с F() не отправляет post_save, о смене счётчиков
+# сообщает отдельный сигнал с recipe_ids.
+counters_changed = Signal()
+
+
+def change_counter(recipe_ids, field, delta):
+    queryset = Recipe.objects.filter(id__in=recipe_ids)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    if queryset.update(**{field: F(field) + delta}):
+        counters_changed.send(sender=Recipe, recipe_ids=recipe_ids)
+
+
+def _expected_counters():
+    return {
+        field: Coalesce(Subquery(
+            model.objects.filter(recipe=OuterRef('pk'))
+            .order_by().values('recipe')
+            .annotate(cnt=Count('id')).values('cnt'),
+            output_field=IntegerField(),
+        ), 0)
+        for field, model in COUNTERS.items()
+    }
+
+
+def get_counter_mismatches():
+    expected = {f'expected_{field}': value
+                for field, value in _expected_counters().items()}
+    mismatched = Q()
+    for field in COUNTERS:
+        mismatched |= ~Q(**{field: F(f'expected_{field}')})
+    queryset = (
+        Recipe.objects.annotate(**expected).filter(mismatched)
+        .order_by('id')
+        .values('id', *COUNTERS, *expected)
+    )
+    return [
+        (row['id'], field, row[f'expected_{field}'], row[field])
+        for row in queryset
+        for field in COUNTERS
+        if row[field] != row[f'expected_{field}']
+    ]
+
+
+def rebuild_counters(recipe_ids=None):
+    queryset = Recipe.objects.all()
+    if recipe_ids is not None:
+        queryset = queryset.filter(id__in=recipe_ids)
+    cnt = queryset.update(**_expected_counters())
+    counters_changed.send(sender=Recipe, recipe_ids=recipe_ids)
+    return cnt
@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from users.models import Subscription, User
+from .models import FeedItem, Recipe
+
+
+def _bulk_add(items, batch_size=1000):
+    FeedItem.objects.bulk_create(
+        items, batch_size=batch_size, ignore_conflicts=True,
+    )
+
+
+def get_follower_count(author_id):
+    return User.objects.filter(id=author_id).values_list(
+        'followers_count', flat=True,
+    ).first() or 0
+
+
+def fan_out_recipe(recipe, batch_size=1000):
+    if get_follower_count(recipe.author_id) > settings.FEED_FANOUT_LIMIT:
+        return
+    user_ids = Subscription.objects.filter(
+        author_id=recipe.author_id
+    ).values_list('user_id', flat=True)
+    _bulk_add(
+        (FeedItem(user_id=user_id, recipe=recipe, pub_date=recipe.pub_date)
+         for user_id in user_ids.iterator()),
+        batch_size,
+    )
+
+
+def add_author_to_feed(user_id, author_id):
+    if get_follower_count(author_id) > settings.FEED_FANOUT_LIMIT:
+        return
+    recipes = Recipe.objects.filter(
+        author_id=author_id
+    ).order_by('-pub_date', '-id').values_list(
+        'id', 'pub_date',
+    )[:settings.FEED_BACKFILL_SIZE]
+    _bulk_add(
+        FeedItem(user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+        for recipe_id, pub_date in recipes
+    )
+
+
+def remove_author_from_feed(user_id, author_id):
+    FeedItem.objects.filter(
+        user_id=user_id, recipe__author_id=author_id,
+    ).delete()
+
+
+def get_fan_out_on_read_authors(user):
+    return Subscription.objects.filter(
+        user=user, author__followers_count__gt=settings.FEED_FANOUT_LIMIT,
+    ).values_list('author_id', flat=True)
+
+
+def get_feed_items(queryset, user):
+    items = FeedItem.objects.filter(user=user)
+    if queryset.query.has_filters():
+        items = items.filter(recipe__in=queryset.values('id'))
+    return items
+
+
+def get_fan_out_on_read_recipes(queryset, user):
+    authors = list(get_fan_out_on_read_authors(user))
+    if not authors:
+        return queryset.none()
+    return queryset.filter(author_id__in=authors)
+
+
+def get_feed(queryset, user):
+    feed = Q(id__in=FeedItem.objects.filter(user=user).values('recipe_id'))
+    authors = list(get_fan_out_on_read_authors(user))
+    if authors:
+        feed |= Q(author_id__in=authors)
+    return queryset.filter(feed)
+
+
+def rebuild_follower_counts():
+    return User.objects.update(followers_count=Coalesce(Subquery(
+        Subscription.objects.filter(author=OuterRef('pk'))
+        .order_by().values('author')
+        .annotate(cnt=Count('id')).values('cnt'),
+        output_field=IntegerField(),
+    ), 0))
+
+
+def rebuild_feeds():
+    rebuild_follower_counts()
+    FeedItem.objects.all().delete()
+    cnt = 0
+    subscriptions = Subscription.objects.values_list('user_id', 'author_id')
+    for user_id, author_id in subscriptions.iterator():
+        add_author_to_feed(user_id, author_id)
+        cnt += 1
+    return cnt
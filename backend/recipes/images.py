@@ -0,0 +1,65 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps, features
+
+DERIVATIVES = {
+    'thumbnail': (150, 150),
+    'card': (600, 600),
+    'full': (1600, 1600),
+}
+
+
+def _save_derivative(storage, image, path, image_format, **options):
+    buffer = BytesIO()
+    image.save(buffer, format=image_format, **options)
+    return storage.save(path, ContentFile(buffer.getvalue()))
+
+
+def delete_derivatives(storage, derivatives):
+    for path in (derivatives or {}).values():
+        if path and storage.exists(path):
+            storage.delete(path)
+
+
+def make_derivatives(image_field):
+    storage = image_field.storage
+    stem = os.path.splitext(image_field.name)[0]
+    make_webp = settings.IMAGE_WEBP_DERIVATIVES and features.check('webp')
+    derivatives = {}
+    with image_field.open('rb') as file, Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'L'):
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            image = image.convert('RGBA')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        for name, size in DERIVATIVES.items():
+            derivative = image.copy()
+            derivative.thumbnail(size, Image.LANCZOS)
+            derivatives[name] = _save_derivative(
+                storage, derivative, f'{stem}_{name}.jpg', 'JPEG',
+                quality=85, optimize=True, progressive=True,
+            )
+            if make_webp:
+                derivatives[f'{name}_webp'] = _save_derivative(
+                    storage, derivative, f'{stem}_{name}.webp', 'WEBP',
+                    quality=80,
+                )
+    return derivatives
+
+
+def update_recipe_derivatives(recipe):
+    storage = recipe.image.storage
+    old_derivatives = recipe.image_derivatives
+    recipe.image_derivatives = (
+        make_derivatives(recipe.image) if recipe.image else {}
+    )
+    recipe.save(update_fields=('image_derivatives',))
+    # При откате транзакции рецепт продолжит ссылаться на старые копии.
+    transaction.on_commit(
+        lambda: delete_derivatives(storage, old_derivatives)
+    )
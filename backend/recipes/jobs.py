@@ -0,0 +1,20 @@
+from jobs.registry import job
+
+from .feed import fan_out_recipe
+from .images import update_recipe_derivatives
+from .models import Recipe
+
+
+@job('recipes.make_image_derivatives')
+def make_image_derivatives(recipe_id, image_name):
+    recipe = Recipe.objects.filter(id=recipe_id).first()
+    if recipe is None or recipe.image.name != image_name:
+        return
+    update_recipe_derivatives(recipe)
+
+
+@job('recipes.fan_out_recipe')
+def fan_out(recipe_id):
+    recipe = Recipe.objects.filter(id=recipe_id).first()
+    if recipe is not None:
+        fan_out_recipe(recipe)
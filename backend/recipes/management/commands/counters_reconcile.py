@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, no_translations
+
+from recipes.counters import get_counter_mismatches, rebuild_counters
+
+
+class Command(BaseCommand):
+    help = ('Сверяет счётчики избранного и корзин у рецептов '
+            'с фактическими записями и исправляет расхождения')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать расхождения, не исправляя их',
+        )
+
+    @no_translations
+    def handle(self, *args, **options):
+        mismatches = get_counter_mismatches()
+        for recipe_id, field, expected, stored in mismatches:
+            self.stdout.write(
+                f'Рецепт {recipe_id}, {field}: '
+                f'ожидается {expected}, сохранено {stored}'
+            )
+        recipe_ids = {recipe_id for recipe_id, *_ in mismatches}
+        if not recipe_ids:
+            self.stdout.write('Счётчики согласованы')
+        elif options['dry_run']:
+            self.stdout.write(
+                f'Расхождения у {len(recipe_ids)} рецептов, '
+                'пробный запуск, изменения не сохранены'
+            )
+        else:
+            cnt = rebuild_counters(recipe_ids)
+            self.stdout.write(f'Исправлены счётчики у {cnt} рецептов')
@@ -1,45 +1,148 @@
 import csv
+import json
 import os
+from itertools import islice
 
-from django.core.management.base import BaseCommand, no_translations
+from django.core.management.base import (BaseCommand, CommandError,
+                                         no_translations)
 from django.conf import settings
+from django.db import transaction
 
-from recipes.models import Component, ComponentUnit
+from recipes.models import Component, ComponentUnit, make_slug
 
 
 TABLES_FOR_LOAD = (('ingredients.csv', Component,),)
 
 CSV_FILES_DIR = settings.BASE_DIR.parent / 'data'
 
+BATCH_SIZE = 1000
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8') as csvfile:
+        for row in csv.reader(csvfile, delimiter=','):
+            if len(row) >= 2:
+                yield row[0], row[1]
+
+
+def read_json(path):
+    with open(path, encoding='utf-8') as jsonfile:
+        for item in json.load(jsonfile):
+            yield item['name'], item['measurement_unit']
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class DryRunRollback(Exception):
+    pass
+
 
 class Command(BaseCommand):
-    help = 'Загружает данные ингредиентов из csv'
+    help = 'Загружает данные ингредиентов из csv или json'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?',
+            default=os.path.join(CSV_FILES_DIR, TABLES_FOR_LOAD[0][0]),
+            help='Путь к файлу (по умолчанию data/ingredients.csv)',
+        )
+        parser.add_argument(
+            '--format', choices=READERS, dest='file_format',
+            help='Формат файла; по умолчанию определяется по расширению',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help=f'Размер пачки записей (по умолчанию {BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Проверить загрузку без сохранения в базу',
+        )
+
+    def resolve_units(self, units, names):
+        missing = {name for name in names if name not in units}
+        if not missing:
+            return
+        ComponentUnit.objects.bulk_create(
+            (ComponentUnit(name=name, slug=make_slug(name))
+             for name in missing),
+            ignore_conflicts=True,
+        )
+        units.update(
+            ComponentUnit.objects.filter(
+                name__in=missing
+            ).values_list('name', 'id')
+        )
+
+    def load(self, rows, batch_size):
+        units = dict(ComponentUnit.objects.values_list('name', 'id'))
+        cnt = skipped = 0
+        for batch in batches(rows, batch_size):
+            batch = [
+                (name.strip(), unit.strip().lower()) for name, unit in batch
+            ]
+            self.resolve_units(units, {unit for _, unit in batch})
+            components = []
+            for name, unit in batch:
+                if not name or unit not in units:
+                    self.stderr.write(f'Пропущена строка: {name}, {unit}')
+                    skipped += 1
+                    continue
+                components.append(Component(name=name, unit_id=units[unit]))
+            Component.objects.bulk_create(
+                components, ignore_conflicts=True,
+            )
+            cnt += len(batch)
+            if self.verbosity >= 1:
+                self.stdout.write(f'Обработано {cnt} записей')
+        return cnt, skipped
 
     @no_translations
     def handle(self, *args, **options):
-        csv_file_path = os.path.join(CSV_FILES_DIR, TABLES_FOR_LOAD[0][0])
-        print(f'Пробуем загрузить таблицу {csv_file_path}')
-
-        with open(csv_file_path, newline='', encoding='utf-8') as csvfile:
-            unit_dict = {}
-            reader = csv.reader(csvfile, delimiter=',')
-
-            cnt = 0
-            for row in reader:
-                unit = row[1]
-                if unit in unit_dict:
-                    component_unit = unit_dict[unit]
-                else:
-                    component_unit = ComponentUnit.objects.get_or_create(
-                        name=unit
-                    )
-                    unit_dict[unit] = component_unit
-                name = row[0]
-                data = {
-                    'name': name,
-                    'unit': component_unit[0],
-                }
-                print(Component.objects.get_or_create(**data))
-                cnt += 1
-
-        print(f'Загружена таблица {csv_file_path} - {cnt} записей')
+        path = options['path']
+        file_format = (options['file_format']
+                       or os.path.splitext(path)[1].lstrip('.').lower())
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        if options['batch_size'] < 1:
+            raise CommandError('Размер пачки должен быть больше 0')
+        self.verbosity = options['verbosity']
+        self.stdout.write(f'Пробуем загрузить таблицу {path}')
+
+        units_before = ComponentUnit.objects.count()
+        components_before = Component.objects.count()
+        try:
+            with transaction.atomic():
+                cnt, skipped = self.load(
+                    READERS[file_format](path), options['batch_size'],
+                )
+                units_created = (ComponentUnit.objects.count()
+                                 - units_before)
+                components_created = (Component.objects.count()
+                                      - components_before)
+                if options['dry_run']:
+                    raise DryRunRollback
+        except DryRunRollback:
+            self.stdout.write('Пробный запуск, изменения не сохранены')
+        except (OSError, KeyError, ValueError) as error:
+            raise CommandError(f'Ошибка чтения {path}: {error}')
+
+        self.stdout.write(
+            f'Загружена таблица {path} - {cnt} записей, '
+            f'новых ингредиентов {components_created}, '
+            f'новых единиц измерения {units_created}, '
+            f'пропущено {skipped}'
+        )
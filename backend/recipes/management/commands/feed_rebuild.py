@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, no_translations
+from django.db import transaction
+
+from recipes.feed import rebuild_feeds
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок пользователей'
+
+    @no_translations
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            cnt = rebuild_feeds()
+        self.stdout.write(f'Ленты пересобраны - {cnt} подписок')
@@ -0,0 +1,116 @@
+import re
+
+from django.core.management.base import (BaseCommand, CommandError,
+                                         no_translations)
+from django.db import connection
+from django.db.models import Exists, OuterRef
+
+from recipes.feed import get_feed_items
+from recipes.models import (Favorite, Recipe, RecipeComponent, ShoppingCart,
+                            ShoppingListItem, Tag)
+from users.models import User
+
+LIMIT = 6
+
+# Полный проход по таблице без индекса: "Seq Scan on table" в PostgreSQL,
+# "SCAN table" без "USING INDEX" в SQLite.
+SEQUENTIAL_SCAN = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(
+        r'\bSCAN (?:TABLE )?(\w+)(?!.*\bUSING (?:COVERING )?INDEX\b)'
+    ),
+}
+
+
+def get_hot_queries(user, author, tag):
+    recipes = Recipe.objects.order_by('-pub_date', '-id')
+    recipe_ids = list(recipes.values_list('id', flat=True)[:LIMIT])
+    return {
+        'recipes-list': recipes[:LIMIT],
+        'recipes-by-author': recipes.filter(author=author)[:LIMIT],
+        'recipes-by-tag': recipes.filter(tags__slug=tag.slug)[:LIMIT],
+        'recipes-popular': Recipe.objects.order_by(
+            '-favorites_count', '-in_carts_count', '-pub_date', '-id',
+        )[:LIMIT],
+        'recipes-flags': recipes.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('id'),
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('id'),
+            )),
+        )[:LIMIT],
+        'recipes-favorited': recipes.filter(favorites__user=user)[:LIMIT],
+        'recipes-in-cart': recipes.filter(cart__user=user)[:LIMIT],
+        'recipes-feed': get_feed_items(recipes, user).order_by(
+            '-pub_date', '-recipe',
+        )[:LIMIT],
+        'recipe-components': RecipeComponent.objects.filter(
+            recipe_id__in=recipe_ids,
+        ).select_related('component__unit'),
+        'favorites-by-user': Favorite.objects.filter(user=user),
+        'cart-by-user': ShoppingCart.objects.filter(user=user),
+        'shopping-list': ShoppingListItem.objects.filter(
+            user=user,
+        ).order_by('component__name'),
+        'subscriptions': User.objects.filter(
+            subscribing__user=user,
+        ).order_by('role', 'username', 'id')[:LIMIT],
+    }
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN для частых запросов и отмечает полные '
+            'проходы по таблицам; запускать на заполненной базе, '
+            'например после seed_fake_data')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ignore', action='append', default=[],
+            help='Таблица, проход по которой допустим '
+                 '(можно указать несколько раз)',
+        )
+        parser.add_argument(
+            '--fail', action='store_true',
+            help='Завершиться с ошибкой, если найдены полные проходы',
+        )
+
+    @no_translations
+    def handle(self, *args, **options):
+        pattern = SEQUENTIAL_SCAN.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(
+                f'EXPLAIN не поддерживается для {connection.vendor}'
+            )
+        user = User.objects.filter(cart__isnull=False).first()
+        author = User.objects.filter(recipes__isnull=False).first()
+        tag = Tag.objects.first()
+        if user is None or author is None or tag is None:
+            raise CommandError(
+                'Нужны пользователи, рецепты, теги и корзины, '
+                'заполните базу командой seed_fake_data'
+            )
+
+        flagged = 0
+        queries = get_hot_queries(user, author, tag)
+        for name, queryset in queries.items():
+            plan = queryset.explain()
+            scans = sorted({
+                table for table in pattern.findall(plan)
+                if table not in options['ignore']
+            })
+            if scans:
+                flagged += 1
+                self.stdout.write(
+                    f'{name}: полный проход по {", ".join(scans)}'
+                )
+            else:
+                self.stdout.write(f'{name}: OK')
+            if options['verbosity'] >= 2:
+                self.stdout.write(plan)
+        if flagged and options['fail']:
+            raise CommandError(f'Полные проходы в {flagged} запросах')
+        self.stdout.write(
+            f'Проверено запросов: {len(queries)}, '
+            f'с полным проходом: {flagged}'
+        )
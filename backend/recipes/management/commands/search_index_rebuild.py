@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, no_translations
+from django.db import transaction
+
+from recipes.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает поисковый индекс рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    @no_translations
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            cnt = rebuild_search_index(options['batch_size'])
+        self.stdout.write(f'Поисковый индекс пересчитан - {cnt} рецептов')
@@ -0,0 +1,180 @@
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import (BaseCommand, CommandError,
+                                         no_translations)
+from django.db import transaction
+
+from recipes.counters import rebuild_counters
+from recipes.feed import rebuild_feeds
+from recipes.models import (Component, ComponentUnit, Favorite, Recipe,
+                            RecipeComponent, ShoppingCart, Tag, make_slug)
+from recipes.search import update_search_index
+from recipes.utils import rebuild_shopping_lists
+from users.models import Subscription, User
+
+BATCH_SIZE = 1000
+PASSWORD = 'foodgram-fake'
+
+COUNTS = (
+    ('users', 100, 'Число пользователей'),
+    ('recipes', 1000, 'Число рецептов'),
+    ('tags', 10, 'Число тегов'),
+    ('ingredients', 500,
+     'Число ингредиентов, создаётся, если в базе их меньше'),
+    ('components', 6, 'Ингредиентов в рецепте'),
+    ('favorites', 20, 'Рецептов в избранном у пользователя'),
+    ('carts', 5, 'Рецептов в корзине у пользователя'),
+    ('subscriptions', 10, 'Подписок у пользователя'),
+)
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу случайными пользователями, рецептами, тегами, '
+            'избранным, корзинами и подписками для нагрузочных тестов')
+
+    def add_arguments(self, parser):
+        for name, default, help_text in COUNTS:
+            parser.add_argument(
+                f'--{name}', type=int, default=default,
+                help=f'{help_text} (по умолчанию {default})',
+            )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Начальное значение генератора случайных чисел',
+        )
+        parser.add_argument(
+            '--prefix', default='fake',
+            help='Префикс имён создаваемых записей (по умолчанию fake)',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help=f'Размер пачки записей (по умолчанию {BATCH_SIZE})',
+        )
+
+    def bulk_create(self, model, objs):
+        model.objects.bulk_create(
+            objs, batch_size=self.batch_size, ignore_conflicts=True,
+        )
+        if self.verbosity >= 1:
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: {len(objs)}'
+            )
+
+    def create_users(self, cnt):
+        password = make_password(PASSWORD)
+        usernames = [f'{self.prefix}_user_{i}' for i in range(cnt)]
+        self.bulk_create(User, [
+            User(username=username, email=f'{username}@example.com',
+                 first_name='Имя', last_name=f'Фамилия {i}',
+                 password=password)
+            for i, username in enumerate(usernames)
+        ])
+        return list(User.objects.filter(
+            username__in=usernames,
+        ).order_by('id').values_list('id', flat=True))
+
+    def create_tags(self, cnt):
+        names = [f'{self.prefix} тег {i}' for i in range(cnt)]
+        self.bulk_create(Tag, [
+            Tag(name=name, slug=make_slug(name),
+                color=f'#{self.random.randrange(0x1000000):06X}')
+            for name in names
+        ])
+        return list(Tag.objects.filter(
+            name__in=names,
+        ).order_by('id').values_list('id', flat=True))
+
+    def create_components(self, cnt):
+        missing = cnt - Component.objects.count()
+        if missing > 0:
+            unit, _ = ComponentUnit.objects.get_or_create(
+                name='г', defaults={'slug': make_slug('г')},
+            )
+            self.bulk_create(Component, [
+                Component(name=f'{self.prefix} ингредиент {i}', unit=unit)
+                for i in range(missing)
+            ])
+        return list(Component.objects.order_by('id').values_list(
+            'id', flat=True,
+        )[:cnt])
+
+    def create_recipes(self, cnt, user_ids):
+        names = [f'{self.prefix} рецепт {i}' for i in range(cnt)]
+        self.bulk_create(Recipe, [
+            Recipe(author_id=self.random.choice(user_ids), name=name,
+                   text=f'Описание: {name}',
+                   cooking_time=self.random.randint(1, 180))
+            for name in names
+        ])
+        recipe_ids = []
+        for start in range(0, cnt, self.batch_size):
+            recipe_ids.extend(Recipe.objects.filter(
+                name__in=names[start:start + self.batch_size],
+            ).values_list('id', flat=True))
+        return sorted(recipe_ids)
+
+    def sample(self, population, cnt, exclude=None):
+        population = [item for item in population if item != exclude]
+        return self.random.sample(population, min(cnt, len(population)))
+
+    def create_links(self, model, owner_ids, target_ids, cnt, fields):
+        owner_field, target_field = fields
+        self.bulk_create(model, [
+            model(**{owner_field: owner_id, target_field: target_id})
+            for owner_id in owner_ids
+            for target_id in self.sample(target_ids, cnt, exclude=owner_id)
+        ])
+
+    def seed(self, options):
+        user_ids = self.create_users(options['users'])
+        tag_ids = self.create_tags(options['tags'])
+        component_ids = self.create_components(options['ingredients'])
+        recipe_ids = self.create_recipes(options['recipes'], user_ids)
+
+        self.bulk_create(RecipeComponent, [
+            RecipeComponent(recipe_id=recipe_id, component_id=component_id,
+                            amount=self.random.randint(1, 500))
+            for recipe_id in recipe_ids
+            for component_id in self.sample(
+                component_ids, options['components'],
+            )
+        ])
+        self.bulk_create(Recipe.tags.through, [
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in self.sample(tag_ids, self.random.randint(1, 3))
+        ])
+        self.create_links(Favorite, user_ids, recipe_ids,
+                          options['favorites'], ('user_id', 'recipe_id'))
+        self.create_links(ShoppingCart, user_ids, recipe_ids,
+                          options['carts'], ('user_id', 'recipe_id'))
+        self.create_links(Subscription, user_ids, user_ids,
+                          options['subscriptions'], ('user_id', 'author_id'))
+
+        rebuild_counters(recipe_ids)
+        rebuild_shopping_lists(user_ids)
+        rebuild_feeds()
+        for start in range(0, len(recipe_ids), self.batch_size):
+            update_search_index(recipe_ids[start:start + self.batch_size])
+        return len(user_ids), len(recipe_ids)
+
+    @no_translations
+    def handle(self, *args, **options):
+        for name, _, _ in COUNTS:
+            if options[name] < 0:
+                raise CommandError(f'--{name} не может быть меньше 0')
+        if options['batch_size'] < 1:
+            raise CommandError('Размер пачки должен быть больше 0')
+        if options['users'] < 1 and options['recipes'] > 0:
+            raise CommandError('Для рецептов нужен хотя бы один автор')
+        self.random = random.Random(options['seed'])
+        self.prefix = options['prefix']
+        self.batch_size = options['batch_size']
+        self.verbosity = options['verbosity']
+        with transaction.atomic():
+            users, recipes = self.seed(options)
+        self.stdout.write(
+            f'Создано пользователей {users}, рецептов {recipes}, '
+            f'пароль пользователей: {PASSWORD}'
+        )
@@ -0,0 +1,30 @@
+from django.core.management.base import (BaseCommand, CommandError,
+                                         no_translations)
+
+from recipes.utils import check_shopping_lists
+
+
+class Command(BaseCommand):
+    help = 'Сверяет сводные списки покупок с корзинами пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='id пользователя (можно указать несколько раз)',
+        )
+
+    @no_translations
+    def handle(self, *args, **options):
+        mismatches = check_shopping_lists(options['user_ids'])
+        for user_id, components in sorted(mismatches.items()):
+            for component_id, expected, stored in components:
+                self.stdout.write(
+                    f'Пользователь {user_id}, ингредиент {component_id}: '
+                    f'ожидается {expected}, сохранено {stored}'
+                )
+        if mismatches:
+            raise CommandError(
+                f'Расхождения у {len(mismatches)} пользователей, '
+                'выполните shopping_list_rebuild'
+            )
+        self.stdout.write('Списки покупок согласованы')
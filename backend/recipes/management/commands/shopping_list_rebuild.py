@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, no_translations
+from django.db import transaction
+
+from recipes.utils import rebuild_shopping_lists
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сводные списки покупок по корзинам пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='id пользователя (можно указать несколько раз)',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    @no_translations
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            cnt = rebuild_shopping_lists(
+                options['user_ids'], batch_size=options['batch_size'],
+            )
+        self.stdout.write(f'Списки покупок пересчитаны - {cnt} записей')
@@ -0,0 +1,65 @@
+from django.db import transaction
+
+from .counters import change_counter
+from .models import Favorite, ShoppingCart
+from .utils import (add_to_shopping_list, remove_from_shopping_list,
+                    updating_shopping_lists)
+
+COUNTER_FIELDS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+
+
+def get_marked_ids(user, model, recipe_ids=None):
+    marks = model.objects.filter(user=user)
+    if recipe_ids is not None:
+        marks = marks.filter(recipe_id__in=recipe_ids)
+    return frozenset(marks.values_list('recipe_id', flat=True))
+
+
+def _lock_user_marks(user):
+    # Отметки одного пользователя меняются по очереди: параллельный
+    # запрос ждёт блокировку строки пользователя и видит уже вставленное.
+    list(type(user).objects.select_for_update().filter(
+        pk=user.pk,
+    ).values_list('pk', flat=True))
+
+
+def add_marks(user, model, recipe_ids):
+    recipe_ids = list(dict.fromkeys(recipe_ids))
+    if not recipe_ids:
+        return recipe_ids
+    with transaction.atomic(), updating_shopping_lists():
+        _lock_user_marks(user)
+        marked_ids = get_marked_ids(user, model, recipe_ids)
+        added = [
+            recipe_id for recipe_id in recipe_ids
+            if recipe_id not in marked_ids
+        ]
+        if not added:
+            return added
+        model.objects.bulk_create(
+            (model(user=user, recipe_id=recipe_id) for recipe_id in added),
+            ignore_conflicts=True,
+        )
+        change_counter(added, COUNTER_FIELDS[model], 1)
+        if model is ShoppingCart:
+            add_to_shopping_list(user, added)
+    return added
+
+
+def remove_marks(user, model, recipe_ids):
+    with transaction.atomic(), updating_shopping_lists():
+        _lock_user_marks(user)
+        marks = model.objects.filter(user=user, recipe_id__in=recipe_ids)
+        removed = list(
+            marks.select_for_update().values_list('recipe_id', flat=True)
+        )
+        if not removed:
+            return removed
+        marks.filter(recipe_id__in=removed).delete()
+        change_counter(removed, COUNTER_FIELDS[model], -1)
+        if model is ShoppingCart:
+            remove_from_shopping_list(user, removed)
+    return removed
@@ -0,0 +1,56 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE recipes_recipe ADD COLUMN search_vector tsvector'
+        )
+        schema_editor.execute(
+            'UPDATE recipes_recipe SET search_vector = '
+            "setweight(to_tsvector('russian', recipes_recipe.name), 'A') || "
+            "setweight(to_tsvector('russian', recipes_recipe.text), 'B') || "
+            "setweight(to_tsvector('russian', coalesce(("
+            "SELECT string_agg(c.name, ' ') "
+            'FROM recipes_recipecomponent rc '
+            'JOIN recipes_component c ON c.id = rc.component_id '
+            "WHERE rc.recipe_id = recipes_recipe.id), '')), 'C')"
+        )
+        schema_editor.execute(
+            'CREATE INDEX recipes_recipe_search_vector_gin '
+            'ON recipes_recipe USING gin (search_vector)'
+        )
+    elif schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5('
+            "name, text, ingredients, tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            'INSERT INTO recipes_recipe_fts (rowid, name, text, ingredients) '
+            'SELECT r.id, r.name, r.text, coalesce(('
+            "SELECT group_concat(c.name, ' ') "
+            'FROM recipes_recipecomponent rc '
+            'JOIN recipes_component c ON c.id = rc.component_id '
+            "WHERE rc.recipe_id = r.id), '') "
+            'FROM recipes_recipe r'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE recipes_recipe DROP COLUMN search_vector'
+        )
+    elif schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE recipes_recipe_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 3.2.16 on 2026-10-18 18:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_feeds(apps, schema_editor):
+    FeedItem = apps.get_model('recipes', 'FeedItem')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Subscription = apps.get_model('users', 'Subscription')
+    subscriptions = Subscription.objects.values_list('user_id', 'author_id')
+    for user_id, author_id in subscriptions.iterator():
+        followers = Subscription.objects.filter(author_id=author_id).count()
+        if followers > settings.FEED_FANOUT_LIMIT:
+            continue
+        recipe_ids = Recipe.objects.filter(
+            author_id=author_id
+        ).order_by('-pub_date', '-id').values_list(
+            'id', flat=True
+        )[:settings.FEED_BACKFILL_SIZE]
+        FeedItem.objects.bulk_create(
+            (FeedItem(user_id=user_id, recipe_id=recipe_id)
+             for recipe_id in recipe_ids),
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0004_recipe_image_derivatives'),
+        ('users', '0003_alter_user_role'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Лента подписок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='feeditem',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_FeedItem'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 3.2.16 on 2026-10-18 18:13
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    counters = {}
+    for field, model_name in (('favorites_count', 'Favorite'),
+                              ('in_carts_count', 'ShoppingCart')):
+        model = apps.get_model('recipes', model_name)
+        counters[field] = Coalesce(models.Subquery(
+            model.objects.filter(recipe=models.OuterRef('pk'))
+            .order_by().values('recipe')
+            .annotate(cnt=models.Count('id')).values('cnt'),
+            output_field=models.IntegerField(),
+        ), 0)
+    Recipe.objects.update(**counters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_feeditem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В корзинах'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-in_carts_count', '-pub_date'], name='recipe_popular_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
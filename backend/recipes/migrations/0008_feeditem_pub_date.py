@@ -0,0 +1,29 @@
+# Generated by Django 3.2.16 on 2026-10-18 19:05
+
+from django.db import migrations, models
+
+
+def fill_pub_date(apps, schema_editor):
+    FeedItem = apps.get_model('recipes', 'FeedItem')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FeedItem.objects.update(pub_date=models.Subquery(
+        Recipe.objects.filter(
+            pk=models.OuterRef('recipe_id'),
+        ).values('pub_date')[:1],
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feeditem',
+            name='pub_date',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Дата публикации рецепта'),
+        ),
+        migrations.RunPython(fill_pub_date, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.2.16 on 2026-10-18 19:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_feeditem_pub_date'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='feeditem',
+            name='pub_date',
+            field=models.DateTimeField(editable=False, verbose_name='Дата публикации рецепта'),
+        ),
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['user', '-pub_date', '-recipe'], name='feeditem_user_pub_date_idx'),
+        ),
+    ]
@@ -3,10 +3,16 @@ from django.db import models
 from django.template.defaultfilters import slugify
 from transliterate import translit
 
+from foodgram.models import CounterFieldsMixin
+
 
 User = get_user_model()
 
 
+def make_slug(name):
+    return slugify(translit(name, language_code='ru', reversed=True))
+
+
 class ComponentUnit(models.Model):
     slug = models.SlugField(max_length=64, unique=True,
                             verbose_name='Ссылка',)
@@ -25,8 +31,7 @@ class ComponentUnit(models.Model):
     def save(self, *args, **kwargs):
         self.name = self.name.strip().lower()
         if not self.slug:
-            tmp = translit(self.name, language_code='ru', reversed=True)
-            self.slug = slugify(tmp)
+            self.slug = make_slug(self.name)
         return super().save(*args, **kwargs)
 
 
@@ -70,12 +75,11 @@ class Tag(models.Model):
     def save(self, *args, **kwargs):
         self.name = self.name.strip().lower()
         if not self.slug:
-            tmp = translit(self.name, language_code='ru', reversed=True)
-            self.slug = slugify(tmp)
+            self.slug = make_slug(self.name)
         return super().save(*args, **kwargs)
 
 
-class Recipe(models.Model):
+class Recipe(CounterFieldsMixin, models.Model):
     author = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name='recipes',
         verbose_name='Автор публикации',)
@@ -83,6 +87,9 @@ class Recipe(models.Model):
     image = models.ImageField(
         upload_to='recipes/images/', null=True, blank=True,
         verbose_name='Изображение рецепта', default=None)
+    image_derivatives = models.JSONField(
+        default=dict, blank=True, editable=False,
+        verbose_name='Уменьшенные копии изображения',)
     text = models.TextField(verbose_name='Описание рецепта',)
     ingredients = models.ManyToManyField(Component,
                                          through='RecipeComponent',
@@ -92,12 +99,27 @@ class Recipe(models.Model):
     cooking_time = models.PositiveSmallIntegerField(
         verbose_name='Время приготовления рецепта',)
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True,)
+    favorites_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='В избранном',)
+    in_carts_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='В корзинах',)
+
+    COUNTER_FIELDS = ('favorites_count', 'in_carts_count',)
 
     class Meta:
         ordering = ('-pub_date',)
         constraints = (models.UniqueConstraint(
                        fields=('name', 'author'),
                        name='unique_recipe'),)
+        indexes = (
+            models.Index(fields=('-pub_date', '-id'),
+                         name='recipe_pub_date_idx'),
+            models.Index(fields=('author', '-pub_date', '-id'),
+                         name='recipe_author_pub_date_idx'),
+            models.Index(fields=('-favorites_count', '-in_carts_count',
+                                 '-pub_date'),
+                         name='recipe_popular_idx'),
+        )
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -174,3 +196,67 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user} добавил {self.recipe} в корзину'
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='shopping_list',
+        verbose_name='Пользователь',
+    )
+    component = models.ForeignKey(
+        Component, on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Ингредиент',
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество ингредиента в списке покупок',)
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'component'),
+                name='unique_ShoppingListItem'
+            ),
+        )
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Список покупок'
+
+    def __str__(self):
+        return f'{self.user}: {self.component} - {self.amount}'
+
+
+class FeedItem(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='feed',
+        verbose_name='Подписчик',
+    )
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Рецепт',
+    )
+    pub_date = models.DateTimeField(
+        'Дата публикации рецепта', editable=False,
+    )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_FeedItem'
+            ),
+        )
+        indexes = (
+            models.Index(fields=('user', '-pub_date', '-recipe'),
+                         name='feeditem_user_pub_date_idx'),
+        )
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
+
+    def save(self, *args, **kwargs):
+        if self.pub_date is None:
+            self.pub_date = self.recipe.pub_date
+        return super().save(*args, **kwargs)
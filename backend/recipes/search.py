@@ -0,0 +1,123 @@
+import re
+
+from django.db import connection
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+
+from .models import Component, Recipe, RecipeComponent
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipes_recipe_fts'
+
+RECIPE_TABLE = Recipe._meta.db_table
+RECIPE_COMPONENT_TABLE = RecipeComponent._meta.db_table
+COMPONENT_TABLE = Component._meta.db_table
+
+
+def _is_postgresql():
+    return connection.vendor == 'postgresql'
+
+
+def _update_postgresql(recipe_ids):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {RECIPE_TABLE} SET search_vector = '
+            f"setweight(to_tsvector(%s, {RECIPE_TABLE}.name), 'A') || "
+            f"setweight(to_tsvector(%s, {RECIPE_TABLE}.text), 'B') || "
+            "setweight(to_tsvector(%s, coalesce(("
+            "SELECT string_agg(c.name, ' ') "
+            f'FROM {RECIPE_COMPONENT_TABLE} rc '
+            f'JOIN {COMPONENT_TABLE} c ON c.id = rc.component_id '
+            f"WHERE rc.recipe_id = {RECIPE_TABLE}.id), '')), 'C') "
+            f'WHERE {RECIPE_TABLE}.id = ANY(%s)',
+            [SEARCH_CONFIG, SEARCH_CONFIG, SEARCH_CONFIG, list(recipe_ids)],
+        )
+
+
+def _update_sqlite(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+            recipe_ids,
+        )
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, text, ingredients) '
+            'SELECT r.id, r.name, r.text, coalesce(('
+            "SELECT group_concat(c.name, ' ') "
+            f'FROM {RECIPE_COMPONENT_TABLE} rc '
+            f'JOIN {COMPONENT_TABLE} c ON c.id = rc.component_id '
+            "WHERE rc.recipe_id = r.id), '') "
+            f'FROM {RECIPE_TABLE} r WHERE r.id IN ({placeholders})',
+            recipe_ids,
+        )
+
+
+def update_search_index(recipe_ids):
+    recipe_ids = set(recipe_ids)
+    if not recipe_ids:
+        return
+    if _is_postgresql():
+        _update_postgresql(recipe_ids)
+    else:
+        _update_sqlite(recipe_ids)
+
+
+def delete_from_search_index(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids or _is_postgresql():
+        return
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+            recipe_ids,
+        )
+
+
+def rebuild_search_index(batch_size=1000):
+    recipe_ids = Recipe.objects.order_by('id').values_list('id', flat=True)
+    batch = []
+    cnt = 0
+    for recipe_id in recipe_ids.iterator():
+        batch.append(recipe_id)
+        if len(batch) == batch_size:
+            update_search_index(batch)
+            cnt += len(batch)
+            batch = []
+    update_search_index(batch)
+    return cnt + len(batch)
+
+
+def _fts_query(value):
+    words = re.findall(r'\w+', value)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_recipes(queryset, value):
+    if _is_postgresql():
+        match = (
+            f'SELECT id FROM {RECIPE_TABLE} '
+            'WHERE search_vector @@ plainto_tsquery(%s, %s)'
+        )
+        rank = (
+            f'ts_rank({RECIPE_TABLE}.search_vector, '
+            'plainto_tsquery(%s, %s))'
+        )
+        params = (SEARCH_CONFIG, value)
+    else:
+        value = _fts_query(value)
+        if not value:
+            return queryset.none()
+        match = f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+        rank = (
+            f'(SELECT -bm25({FTS_TABLE}, 10.0, 5.0, 2.0) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = {RECIPE_TABLE}.id)'
+        )
+        params = (value,)
+    return queryset.filter(
+        id__in=RawSQL(match, params),
+    ).annotate(
+        search_rank=RawSQL(rank, params, output_field=FloatField()),
+    ).order_by('-search_rank', '-pub_date', '-id')
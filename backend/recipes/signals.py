@@ -0,0 +1,100 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Component, Recipe, RecipeComponent, ShoppingCart
+from .search import delete_from_search_index, update_search_index
+from .utils import (is_updating_recipe_components,
+                    is_updating_shopping_lists, update_cart_shopping_list,
+                    update_shopping_lists)
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, **kwargs):
+    update_search_index((instance.id,))
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    delete_from_search_index((instance.id,))
+
+
+@receiver(post_save, sender=RecipeComponent)
+@receiver(post_delete, sender=RecipeComponent)
+def index_recipe_components(sender, instance, **kwargs):
+    if not is_updating_recipe_components():
+        update_search_index((instance.recipe_id,))
+
+
+@receiver(post_save, sender=Component)
+def index_component_recipes(sender, instance, created, **kwargs):
+    if created:
+        return
+    update_search_index(
+        RecipeComponent.objects.filter(
+            component=instance
+        ).values_list('recipe_id', flat=True)
+    )
+
+
+# Списки покупок обновляются и при правках корзин и ингредиентов
+# в обход API, например из админки. Удаление рецепта каскадом удаляет
+# и корзины, и ингредиенты: что бы ни удалилось первым, второе уже
+# не найдёт пары и не вычтет количество повторно.
+@receiver(pre_save, sender=ShoppingCart)
+@receiver(pre_save, sender=RecipeComponent)
+def remember_shopping_list_row(sender, instance, raw, **kwargs):
+    instance._old_row = None
+    if raw or instance._state.adding or is_updating_shopping_lists():
+        return
+    instance._old_row = sender.objects.filter(pk=instance.pk).first()
+
+
+@receiver(post_save, sender=ShoppingCart)
+def update_cart_shopping_lists(sender, instance, created, raw, **kwargs):
+    if raw or is_updating_shopping_lists():
+        return
+    old = getattr(instance, '_old_row', None)
+    if not created and old is None:
+        return
+    if old is not None:
+        if (old.user_id, old.recipe_id) == (instance.user_id,
+                                            instance.recipe_id):
+            return
+        update_cart_shopping_list(old.user_id, old.recipe_id, -1)
+    update_cart_shopping_list(instance.user_id, instance.recipe_id)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def remove_cart_from_shopping_lists(sender, instance, **kwargs):
+    if not is_updating_shopping_lists():
+        update_cart_shopping_list(instance.user_id, instance.recipe_id, -1)
+
+
+@receiver(post_save, sender=RecipeComponent)
+def update_component_shopping_lists(sender, instance, created, raw,
+                                    **kwargs):
+    if raw or is_updating_shopping_lists():
+        return
+    old = getattr(instance, '_old_row', None)
+    if not created and old is None:
+        return
+    new_components = {instance.component_id: instance.amount}
+    if old is not None and old.recipe_id != instance.recipe_id:
+        update_shopping_lists(
+            old.recipe_id, {old.component_id: old.amount}, {},
+        )
+        old = None
+    old_components = {}
+    if old is not None:
+        old_components[old.component_id] = old.amount
+    update_shopping_lists(
+        instance.recipe_id, old_components, new_components,
+    )
+
+
+@receiver(post_delete, sender=RecipeComponent)
+def remove_component_from_shopping_lists(sender, instance, **kwargs):
+    if not is_updating_shopping_lists():
+        update_shopping_lists(
+            instance.recipe_id, {instance.component_id: instance.amount}, {},
+        )
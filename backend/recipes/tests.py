@@ -0,0 +1,182 @@
+import threading
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+
+from users.models import User
+from .counters import change_counter
+from .marks import add_marks, remove_marks
+from .models import (Component, ComponentUnit, Favorite, Recipe,
+                     RecipeComponent, ShoppingCart, ShoppingListItem)
+from .utils import add_to_shopping_list, check_shopping_lists
+
+
+def create_recipe(author, name='Борщ', amount=100):
+    unit, _ = ComponentUnit.objects.get_or_create(name='г', slug='g')
+    component, _ = Component.objects.get_or_create(name='свёкла', unit=unit)
+    recipe = Recipe.objects.create(
+        author=author, name=name, text='Описание', cooking_time=10,
+    )
+    RecipeComponent.objects.create(
+        recipe=recipe, component=component, amount=amount,
+    )
+    return recipe
+
+
+def create_user(name):
+    return User.objects.create_user(
+        email=f'{name}@example.com', username=name, password='password',
+        first_name=name, last_name=name,
+    )
+
+
+class MarksTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        cls.recipe = create_recipe(cls.user)
+
+    def get_amounts(self):
+        return list(ShoppingListItem.objects.filter(
+            user=self.user,
+        ).values_list('amount', flat=True))
+
+    def test_duplicate_marks_are_not_counted(self):
+        self.assertEqual(
+            add_marks(self.user, ShoppingCart, (self.recipe.id,) * 2),
+            [self.recipe.id],
+        )
+        self.assertEqual(
+            add_marks(self.user, ShoppingCart, (self.recipe.id,)), [],
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.in_carts_count, 1)
+        self.assertEqual(self.get_amounts(), [100])
+
+    def test_mark_added_concurrently_is_not_counted(self):
+        # Отметку успел вставить параллельный запрос.
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        other = create_recipe(self.user, name='Щи')
+        self.assertEqual(
+            add_marks(self.user, Favorite, (self.recipe.id, other.id)),
+            [other.id],
+        )
+        self.assertEqual(
+            dict(Recipe.objects.values_list('id', 'favorites_count')),
+            {self.recipe.id: 0, other.id: 1},
+        )
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        recipes = [create_recipe(self.user, name=str(number))
+                   for number in range(5)]
+        counts = []
+        for batch in (recipes[:1], recipes[1:]):
+            with CaptureQueriesContext(connection) as queries:
+                add_marks(self.user, ShoppingCart,
+                          [recipe.id for recipe in batch])
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_remove_marks(self):
+        add_marks(self.user, ShoppingCart, (self.recipe.id,))
+        self.assertEqual(
+            remove_marks(self.user, ShoppingCart, (self.recipe.id,) * 2),
+            [self.recipe.id],
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.in_carts_count, 0)
+        self.assertEqual(self.get_amounts(), [])
+
+    def test_full_save_keeps_counters(self):
+        recipe = Recipe.objects.get(id=self.recipe.id)
+        change_counter((self.recipe.id,), 'favorites_count', 1)
+        recipe.name = 'Борщ с пампушками'
+        recipe.save()
+        self.recipe.refresh_from_db()
+        self.assertEqual(
+            (self.recipe.name, self.recipe.favorites_count),
+            ('Борщ с пампушками', 1),
+        )
+
+
+class ShoppingListTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        cls.recipe = create_recipe(cls.user)
+        cls.other = create_recipe(cls.user, name='Щи', amount=30)
+
+    def get_list(self):
+        return dict(ShoppingListItem.objects.filter(
+            user=self.user,
+        ).values_list('component__name', 'amount'))
+
+    def test_item_created_concurrently_is_updated(self):
+        # Позицию успел создать параллельный запрос.
+        ShoppingListItem.objects.create(
+            user=self.user, component=self.recipe.ingredients.get(),
+            amount=30,
+        )
+        add_to_shopping_list(self.user, (self.recipe.id,))
+        self.assertEqual(self.get_list(), {'свёкла': 130})
+
+    def test_cart_changes_outside_api(self):
+        cart = ShoppingCart.objects.create(user=self.user, recipe=self.recipe)
+        self.assertEqual(self.get_list(), {'свёкла': 100})
+        cart.recipe = self.other
+        cart.save()
+        self.assertEqual(self.get_list(), {'свёкла': 30})
+        cart.delete()
+        self.assertEqual(self.get_list(), {})
+
+    def test_component_changes_outside_api(self):
+        ShoppingCart.objects.create(user=self.user, recipe=self.recipe)
+        component = RecipeComponent.objects.get(recipe=self.recipe)
+        component.amount = 150
+        component.save()
+        self.assertEqual(self.get_list(), {'свёкла': 150})
+        component.delete()
+        self.assertEqual(self.get_list(), {})
+        RecipeComponent.objects.create(
+            recipe=self.recipe, component=component.component, amount=20,
+        )
+        self.assertEqual(self.get_list(), {'свёкла': 20})
+
+    def test_recipe_delete_outside_api(self):
+        for recipe in (self.recipe, self.other):
+            ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        self.assertEqual(self.get_list(), {'свёкла': 130})
+        self.recipe.delete()
+        self.assertEqual(self.get_list(), {'свёкла': 30})
+        self.assertEqual(check_shopping_lists(), {})
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentMarksTest(TransactionTestCase):
+
+    def test_concurrent_marks_are_counted_once(self):
+        user = create_user('user')
+        recipe = create_recipe(user)
+        barrier = threading.Barrier(4)
+
+        def add():
+            try:
+                barrier.wait()
+                add_marks(user, ShoppingCart, (recipe.id,))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=add) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.in_carts_count, 1)
+        self.assertEqual(
+            list(ShoppingListItem.objects.values_list('amount', flat=True)),
+            [100],
+        )
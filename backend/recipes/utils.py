@@ -0,0 +1,186 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Greatest
+
+from .models import RecipeComponent, ShoppingCart, ShoppingListItem
+
+BATCH_SIZE = 500
+
+_updated_in_bulk = ContextVar('shopping_lists_updated_in_bulk', default=False)
+_components_updated_in_bulk = ContextVar(
+    'recipe_components_updated_in_bulk', default=False,
+)
+
+
+@contextmanager
+def updating_shopping_lists():
+    # Код внутри сам обновляет списки покупок пачкой, сигналы
+    # корзин и ингредиентов их не трогают.
+    token = _updated_in_bulk.set(True)
+    try:
+        yield
+    finally:
+        _updated_in_bulk.reset(token)
+
+
+def is_updating_shopping_lists():
+    return _updated_in_bulk.get()
+
+
+@contextmanager
+def updating_recipe_components():
+    # Ингредиенты рецепта меняются пачкой: поисковый индекс и кэш
+    # обновляются один раз после всех правок, а не по сигналу каждой строки.
+    token = _components_updated_in_bulk.set(True)
+    try:
+        with updating_shopping_lists():
+            yield
+    finally:
+        _components_updated_in_bulk.reset(token)
+
+
+def is_updating_recipe_components():
+    return _components_updated_in_bulk.get()
+
+
+def _update_items(deltas):
+    by_user = defaultdict(list)
+    for user_id, component_id in deltas:
+        by_user[user_id].append(component_id)
+    keys = Q()
+    for user_id, component_ids in by_user.items():
+        keys |= Q(user_id=user_id, component_id__in=component_ids)
+    items = ShoppingListItem.objects.filter(keys)
+    items.update(amount=Greatest(F('amount') + Case(
+        *(When(user_id=user_id, component_id=component_id,
+               then=Value(delta))
+          for (user_id, component_id), delta in deltas.items()),
+        default=Value(0), output_field=IntegerField(),
+    ), Value(0)))
+    items.filter(amount=0).delete()
+
+
+def _apply_shopping_list_deltas(deltas):
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    # Недостающие позиции вставляются с нулём и пропускаются, если их
+    # успел создать параллельный запрос, а количество меняется через F().
+    ShoppingListItem.objects.bulk_create(
+        (ShoppingListItem(user_id=user_id, component_id=component_id,
+                          amount=0)
+         for (user_id, component_id), delta in deltas.items()
+         if delta > 0),
+        batch_size=BATCH_SIZE, ignore_conflicts=True,
+    )
+    keys = list(deltas)
+    for start in range(0, len(keys), BATCH_SIZE):
+        _update_items({
+            key: deltas[key] for key in keys[start:start + BATCH_SIZE]
+        })
+
+
+def get_recipe_components(recipe):
+    return dict(
+        RecipeComponent.objects.filter(
+            recipe=recipe
+        ).values_list('component_id', 'amount')
+    )
+
+
+def add_to_shopping_list(user, recipe_ids, sign=1):
+    components = RecipeComponent.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values('component_id').annotate(total=Sum('amount')).order_by()
+    _apply_shopping_list_deltas({
+        (user.id, row['component_id']): sign * row['total']
+        for row in components
+    })
+
+
+def remove_from_shopping_list(user, recipe_ids):
+    add_to_shopping_list(user, recipe_ids, sign=-1)
+
+
+def update_cart_shopping_list(user_id, recipe_id, sign=1):
+    _apply_shopping_list_deltas({
+        (user_id, component_id): sign * amount
+        for component_id, amount in get_recipe_components(recipe_id).items()
+    })
+
+
+def update_shopping_lists(recipe, old_components, new_components):
+    changes = {
+        component_id: (new_components.get(component_id, 0)
+                       - old_components.get(component_id, 0))
+        for component_id in {*old_components, *new_components}
+    }
+    changes = {key: delta for key, delta in changes.items() if delta}
+    if not changes:
+        return
+    user_ids = ShoppingCart.objects.filter(
+        recipe=recipe
+    ).values_list('user_id', flat=True)
+    _apply_shopping_list_deltas({
+        (user_id, component_id): delta
+        for user_id in user_ids
+        for component_id, delta in changes.items()
+    })
+
+
+def remove_recipe_from_shopping_lists(recipe):
+    update_shopping_lists(recipe, get_recipe_components(recipe), {})
+
+
+def get_expected_shopping_lists(user_ids=None):
+    if user_ids is None:
+        cart_filter = {'recipe__cart__isnull': False}
+    else:
+        cart_filter = {'recipe__cart__user_id__in': user_ids}
+    components = RecipeComponent.objects.filter(**cart_filter)
+    components = components.values(
+        'recipe__cart__user_id', 'component_id',
+    ).annotate(total=Sum('amount')).order_by()
+    return {
+        (row['recipe__cart__user_id'], row['component_id']): row['total']
+        for row in components.iterator()
+    }
+
+
+def rebuild_shopping_lists(user_ids=None, batch_size=1000):
+    expected = get_expected_shopping_lists(user_ids)
+    items = ShoppingListItem.objects.all()
+    if user_ids is not None:
+        items = items.filter(user_id__in=user_ids)
+    items.delete()
+    ShoppingListItem.objects.bulk_create(
+        (ShoppingListItem(user_id=user_id, component_id=component_id,
+                          amount=amount)
+         for (user_id, component_id), amount in expected.items()),
+        batch_size=batch_size,
+    )
+    return len(expected)
+
+
+def check_shopping_lists(user_ids=None):
+    expected = get_expected_shopping_lists(user_ids)
+    items = ShoppingListItem.objects.all()
+    if user_ids is not None:
+        items = items.filter(user_id__in=user_ids)
+    stored = {
+        (user_id, component_id): amount
+        for user_id, component_id, amount in items.values_list(
+            'user_id', 'component_id', 'amount'
+        ).iterator()
+    }
+    mismatches = defaultdict(list)
+    for key in expected.keys() | stored.keys():
+        if expected.get(key) != stored.get(key):
+            user_id, component_id = key
+            mismatches[user_id].append(
+                (component_id, expected.get(key), stored.get(key))
+            )
+    return mismatches
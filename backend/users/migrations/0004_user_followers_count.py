@@ -0,0 +1,31 @@
+# Generated by Django 3.2.16 on 2026-10-18 19:05
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_followers_count(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Subscription = apps.get_model('users', 'Subscription')
+    User.objects.update(followers_count=Coalesce(models.Subquery(
+        Subscription.objects.filter(author=models.OuterRef('pk'))
+        .order_by().values('author')
+        .annotate(cnt=models.Count('id')).values('cnt'),
+        output_field=models.IntegerField(),
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_alter_user_role'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подписчиков'),
+        ),
+        migrations.RunPython(fill_followers_count, migrations.RunPython.noop),
+    ]
@@ -3,10 +3,11 @@ from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy
 
+from foodgram.models import CounterFieldsMixin
 from .validators import validate_username
 
 
-class User(AbstractUser):
+class User(CounterFieldsMixin, AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ('username', 'first_name', 'last_name',)
 
@@ -52,6 +53,11 @@ class User(AbstractUser):
         default=UserRole.USER,
         blank=False,
     )
+    followers_count = models.PositiveIntegerField(
+        'Подписчиков', default=0, editable=False,
+    )
+
+    COUNTER_FIELDS = ('followers_count',)
 
     class Meta:
         verbose_name = 'Пользователь'
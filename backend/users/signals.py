@@ -0,0 +1,20 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Subscription, User
+
+
+@receiver(post_save, sender=Subscription)
+def count_subscription(sender, instance, created, **kwargs):
+    if created:
+        User.objects.filter(id=instance.author_id).update(
+            followers_count=F('followers_count') + 1,
+        )
+
+
+@receiver(post_delete, sender=Subscription)
+def uncount_subscription(sender, instance, **kwargs):
+    User.objects.filter(
+        id=instance.author_id, followers_count__gt=0,
+    ).update(followers_count=F('followers_count') - 1)